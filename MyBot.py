@@ -1,20 +1,45 @@
 # stdlib
+import os
+import re
 import sys
-import datetime
+import gzip
+import atexit
+import inspect
 # local
 import protocol
 import decider
+import instrument
+import logger as logging
 
 
-def genlogger(fn):
+def genlogger(fn, level=logging.DEBUG, off=()):
+    '''Return a buffered logging.Logger; MyBot drains it after each turn.'''
     LOG = open(fn, mode='wb')
     sys.stderr = LOG
-    def f(s, noprefix=False):
-        if noprefix:
-            LOG.write('{}\n'.format(s))
-        else:
-            LOG.write('{} {}\n'.format(datetime.datetime.now(), s))
-        LOG.flush()
+    f = logging.Logger(LOG, level, off)
+    atexit.register(f.drain)
+    return f
+
+
+def genrecorder(fn, decname, options=()):
+    '''Return a function which records a transcript of the game.
+
+    The transcript is gzipped text: a header naming the decider and the
+    options the bot runs with (eg. --cells), then what the bot hears,
+    verbatim, and what it tells, one line each prefixed by "> ". See
+    replay.py.
+
+    '''
+    REC = gzip.open(fn, mode='wb')
+    atexit.register(REC.close)
+    REC.write('# decider {}\n'.format(decname))
+    REC.write('# options {}\n'.format(' '.join(options)))
+    def f(heard=None, told=None):
+        if heard is not None:
+            REC.write(heard if heard.endswith('\n') else heard + '\n')
+        if told is not None:
+            REC.write(''.join('> {}\n'.format(line) for line in told))
+            REC.flush()
     return f
 
 
@@ -22,6 +47,31 @@ def listen():
     return sys.stdin.readline().strip()
 
 
+BLOCKEND = re.compile(r'^(?:ready|go|end)[ \t\r]*$', re.MULTILINE)
+BLOCKBUF = ['']
+
+
+def listen_block():
+    '''Read stdin through the next "ready", "go" or "end" line.
+
+    Return the block of lines, or None once stdin is exhausted.
+
+    '''
+    buf = BLOCKBUF[0]
+    pos = 0
+    while True:
+        end = BLOCKEND.search(buf, pos)
+        if end:
+            BLOCKBUF[0] = buf[end.end():]
+            return buf[:end.end()]
+        pos = max(0, len(buf) - 8)
+        chunk = os.read(sys.stdin.fileno(), 1 << 16)
+        if not chunk:
+            BLOCKBUF[0] = ''
+            return buf or None
+        buf += chunk
+
+
 def tell(s):
     sys.stdout.write(s)
     sys.stdout.write('\n')
@@ -31,6 +81,14 @@ def tell(s):
 def main(deciderprgm=None):
     DECOPT = '--decider'
     LOGOPT = '--log'
+    LEVELOPT = '--loglevel'
+    OFFOPT = '--logoff'
+    GRIDOPT = '--grid'
+    CELLOPT = '--cells'
+    BATCHOPT = '--batch'
+    RECOPT = '--record'
+    SPANOPT = '--spans'
+    WORKOPT = '--workers'
     #
     # decider option
     if DECOPT in sys.argv:
@@ -51,22 +109,115 @@ def main(deciderprgm=None):
     if deciderprgm is not None:
         decname, decclass = deciderprgm, decider.DECIDERS[deciderprgm]
     #
-    # logger option
+    # logger options
+    level, off = logging.DEBUG, ()
+    if LEVELOPT in sys.argv:
+        i = sys.argv.index(LEVELOPT)
+        sys.argv.pop(i)
+        try:
+            level = logging.LEVELS[sys.argv.pop(i)]
+        except (IndexError, KeyError):
+            raise ValueError('{} requires one of: {}'.format(
+                LEVELOPT, ', '.join(sorted(logging.LEVELS))))
+    if OFFOPT in sys.argv:
+        i = sys.argv.index(OFFOPT)
+        sys.argv.pop(i)
+        try:
+            off = sys.argv.pop(i).split(',')
+        except IndexError:
+            raise ValueError('{} option requires an argument'.format(OFFOPT))
     if LOGOPT in sys.argv:
         sys.argv.remove(LOGOPT)
-        logger = genlogger('log-'+decname+'.log')
+        logger = genlogger('log-'+decname+'.log', level, off)
     else:
         logger = None
     #
+    # grid option
+    if GRIDOPT in sys.argv:
+        sys.argv.remove(GRIDOPT)
+        grid = True
+    else:
+        grid = False
+    #
+    # cells option
+    if CELLOPT in sys.argv:
+        sys.argv.remove(CELLOPT)
+        cells = True
+    else:
+        cells = False
+    #
+    # batch option
+    if BATCHOPT in sys.argv:
+        sys.argv.remove(BATCHOPT)
+        batch = True
+    else:
+        batch = False
+    #
+    # record option (the recorder starts once the other options are known)
+    if RECOPT in sys.argv:
+        i = sys.argv.index(RECOPT)
+        sys.argv.pop(i)
+        try:
+            recfn = sys.argv.pop(i)
+        except IndexError:
+            raise ValueError('{} option requires an argument'.format(RECOPT))
+    else:
+        recfn = None
+    #
+    # spans option
+    if SPANOPT in sys.argv:
+        sys.argv.remove(SPANOPT)
+        spans = instrument.Spans('spans-'+decname+'.txt')
+    else:
+        spans = None
+    #
+    # workers option (deciders which can run experts on worker processes)
+    options = {}
+    if WORKOPT in sys.argv:
+        i = sys.argv.index(WORKOPT)
+        sys.argv.pop(i)
+        try:
+            options['workers'] = int(sys.argv.pop(i))
+        except (IndexError, ValueError):
+            raise ValueError('{} option requires a number'.format(WORKOPT))
+        if 'workers' not in inspect.getargspec(decclass.__init__).args:
+            raise ValueError('{} does not apply to {}'.format(
+                WORKOPT, decname))
+    #
+    # recorder, noting the options which change the bot's orders
+    if recfn is not None:
+        recopts = [GRIDOPT] * grid + [CELLOPT] * cells
+        if 'workers' in options:
+            recopts += [WORKOPT, str(options['workers'])]
+        record = genrecorder(recfn, decname, recopts)
+    else:
+        record = lambda heard=None, told=None: None
+    #
     # initialize bot
-    bot = protocol.Bot(decclass(logger), logger)
+    bot = protocol.Bot(decclass(logger, **options), logger, grid, spans,
+                       cells)
     #
     # main loop
-    while True:
-        heard = listen()
-        replies = bot.handle(heard)
-        if replies:
-            tell('\n'.join(replies))
+    if batch:
+        while True:
+            block = listen_block()
+            if block is None:
+                break
+            record(heard=block)
+            replies = bot.handle_block(block)
+            if replies:
+                tell('\n'.join(replies))
+                record(told=replies)
+                logger and logger.drain()
+    else:
+        while True:
+            heard = listen()
+            record(heard=heard)
+            replies = bot.handle(heard)
+            if replies:
+                tell('\n'.join(replies))
+                record(told=replies)
+                logger and logger.drain()
 
 
 if __name__ == '__main__':
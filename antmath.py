@@ -4,28 +4,56 @@ Basic math operations relevant to the ants competition.
 Loc - A tuple of two integers representing a row & column pair.
 Size - A tuple of two integers representing a height & width pair.
 
+The lookup tables below are built once at import; geometry.py holds the
+tables which depend on the map size.
+
 '''
 
+# direction --> (row delta, column delta)
+DISPLACEMENT = {'N': (-1, 0),
+                'E': ( 0, 1),
+                'S': ( 1, 0),
+                'W': ( 0,-1),
+                '=': ( 0, 0)}
+
+# (row sign, column sign) --> direction
+DIRECTION = {delta: v for v, delta in DISPLACEMENT.iteritems()}
+
+REVERSE = {'N':'S',
+           'E':'W',
+           'S':'N',
+           'W':'E',
+           '=':'='}
+
+# sign of a row or column delta --> direction
+ROWDIR = {-1:'N', 0:'=', 1:'S'}
+COLDIR = {-1:'W', 0:'=', 1:'E'}
+
+# integer radius --> list of (squared distance, row delta, column delta)
+DISCS = {}
+
+
+def torus_delta(delta, length):
+    '''Shortest equivalent of a row or column delta on a wrapped axis.
+
+    Halfway around, the negative delta is chosen.
+
+    '''
+    delta %= length
+    return delta - length if 2 * delta >= length else delta
+
+
 def nearest_unwrapped_loc(origin, size, target):
-    '''Find the nearest of the five possible target locations to the origin.
+    '''Find the nearest unwrapped image of the target location to the origin.
     Loc Size Loc --> Loc
 
     Return the squared distance and the location as a tuple.
 
-    Memoizes answers for a given origin and target location; size is assumed
-    not to change during the course of a game.
-
     '''
-    memo = nearest_unwrapped_loc.memo
-    try:
-        return memo[origin, target]
-    except KeyError:
-        h, w = size
-        r, c = target
-        options = [target, (r-h, c), (r+h, c), (r, c-w), (r, c+w)]
-        memo[origin, target] = min((distance2(origin, t), t) for t in options)
-        return memo[origin, target]
-nearest_unwrapped_loc.memo = {}
+    h, w = size
+    dr = torus_delta(target[0] - origin[0], h)
+    dc = torus_delta(target[1] - origin[1], w)
+    return dr * dr + dc * dc, (origin[0] + dr, origin[1] + dc)
 
 
 def wrap_loc(loc, size):
@@ -37,12 +65,8 @@ def wrap_loc(loc, size):
 
 def displace_loc(direction, location):
     '''Give the new location after displacing in the given direction.'''
-    return {'N': lambda loc: (loc[0] - 1, loc[1]    ),
-            'E': lambda loc: (loc[0]    , loc[1] + 1),
-            'S': lambda loc: (loc[0] + 1, loc[1]    ),
-            'W': lambda loc: (loc[0]    , loc[1] - 1),
-            '=': lambda loc: loc,
-            }[direction](location)
+    dr, dc = DISPLACEMENT[direction]
+    return location[0] + dr, location[1] + dc
 
 
 def loc_displacement(oldloc, newloc):
@@ -52,16 +76,8 @@ def loc_displacement(oldloc, newloc):
     the same row or column.
 
     '''
-    rO, cO = oldloc
-    rN, cN = newloc
-    sign = cmp
-    return {(-1, 0):'N',
-            ( 0, 1):'E',
-            ( 1, 0):'S',
-            ( 0,-1):'W',
-            ( 0, 0):'=',
-            }[sign(rN, rO),
-              sign(cN, cO)]
+    return DIRECTION[cmp(newloc[0], oldloc[0]),
+                     cmp(newloc[1], oldloc[1])]
 
 
 def neighbors(loc):
@@ -84,11 +100,7 @@ def eightsquare(loc):
 
 def reverse_dir(direction):
     '''What is the opposite NESW direction?'''
-    return {'N':'S',
-            'E':'W',
-            'S':'N',
-            'W':'E',
-            '=':'='}[direction]
+    return REVERSE[direction]
 
 
 def naive_dir(origin, target):
@@ -103,15 +115,13 @@ def naive_dir(origin, target):
     EG: ['N', 'N'] indicates that the target is due north from origin.
     
     '''
-    ar, ac = origin
-    br, bc = target
-    deltar = br - ar
-    deltac = bc - ac
-    r = {-1:'N', 0:'=', 1:'S'}[cmp(br, ar)]
-    c = {-1:'W', 0:'=', 1:'E'}[cmp(bc, ac)]
+    deltar = target[0] - origin[0]
+    deltac = target[1] - origin[1]
+    r = ROWDIR[cmp(deltar, 0)]
+    c = COLDIR[cmp(deltac, 0)]
     r = c if r == '=' else r
     c = r if c == '=' else c
-    return [r, c] if deltar ** 2 > deltac ** 2 else [c, r]
+    return [r, c] if deltar * deltar > deltac * deltac else [c, r]
 
 
 def distance2(a, b):
@@ -120,6 +130,20 @@ def distance2(a, b):
            (a[1] - b[1]) ** 2
 
 
+def disc(radius):
+    '''Return the cached list of (squared distance, row delta, column delta)
+    within an integer radius, in row-major order.'''
+    try:
+        return DISCS[radius]
+    except KeyError:
+        radius2 = radius ** 2
+        DISCS[radius] = [(r * r + c * c, r, c)
+                         for r in xrange(-radius, radius + 1)
+                         for c in xrange(-radius, radius + 1)
+                         if r * r + c * c <= radius2]
+        return DISCS[radius]
+
+
 def allinradius(radius, loc):
     '''Yield unwrapped Locs within the radius of the given Loc.
 
@@ -127,11 +151,6 @@ def allinradius(radius, loc):
     loc     -- Loc at center
 
     '''
-    radius2 = radius ** 2
-    rA, cA = locA = loc
-    for r in xrange(-radius, radius + 1):
-        for c in xrange(-radius, radius + 1):
-            locB = rA+r, cA+c
-            dist = distance2(locA, locB)
-            if dist <= radius2:
-                yield dist, locB
+    rA, cA = loc
+    for dist, r, c in disc(radius):
+        yield dist, (rA + r, cA + c)
@@ -0,0 +1,159 @@
+# stdlib
+import itertools
+# local
+import antmath
+
+
+'''
+Local battle evaluation for the ants bots.
+
+Models the game's "focus" attack rule: after moving, an ant dies if any enemy
+within the attack radius of it has no more enemies within its own attack
+radius than it does. A Battle scores candidate moves for a cluster of my ants
+against nearby enemy ants by the deaths this rule predicts.
+
+Enemy moves are unknown, so each candidate is scored against a few enemy
+responses (every enemy holds; every enemy steps toward my nearest ant) and
+the deaths are averaged. Enemies are treated as one side, though in the game
+enemies of different players also fight each other.
+
+Cells are geometry.Kernel Cells.
+
+'''
+
+
+DIRECTIONS = 'NESW'
+
+
+###############################################################################
+
+
+class Battle(object):
+    '''Focus-rule evaluator with a bounded cache of in-range pairs.'''
+
+    def __init__(self, kernel, attackradius2, water, capacity=1 << 16):
+        self.kernel = kernel
+        self.rad2 = attackradius2
+        self.water = water          # bytearray; nonzero cells are impassable
+        self.capacity = capacity    # cached pairs kept before starting over
+        self.pairs = {}             # Cell, Cell (ordered) --> bool
+
+    def inrange(self, a, b):
+        '''Are two Cells within the attack radius of each other?'''
+        key = (a, b) if a < b else (b, a)
+        try:
+            return self.pairs[key]
+        except KeyError:
+            if len(self.pairs) >= self.capacity:
+                self.pairs.clear()
+            hit = self.kernel.cell_distance2(a, b) <= self.rad2
+            self.pairs[key] = hit
+            return hit
+
+    def deaths(self, mine, theirs):
+        '''Return (my deaths, their deaths) for ants standing on the given
+        lists of Cells.'''
+        inrange = self.inrange
+        myfoes = [[j for j, e in enumerate(theirs) if inrange(m, e)]
+                  for m in mine]
+        theirfoes = [[i for i, m in enumerate(mine) if inrange(m, e)]
+                     for e in theirs]
+        mydead = sum(1 for foes in myfoes
+                     if any(len(theirfoes[j]) <= len(foes) for j in foes))
+        theirdead = sum(1 for foes in theirfoes
+                        if any(len(myfoes[i]) <= len(foes) for i in foes))
+        return mydead, theirdead
+
+    def responses(self, mine, theirs):
+        '''Return the enemy responses considered, as lists of Cells.'''
+        kernel, water = self.kernel, self.water
+        locs = kernel.locs
+        advance = []
+        for e in theirs:
+            eloc = locs[e]
+            d2, m = min((kernel.cell_distance2(e, m), m) for m in mine)
+            v, _ = antmath.naive_dir(eloc, kernel.unwrap(eloc, locs[m]))
+            step = kernel.cell_step(e, v)
+            advance.append(e if water[step] else step)
+        return [list(theirs), advance]
+
+    def evaluate(self, mine, theirs, moves, responses=None, passable=None):
+        '''Expected (my deaths, their deaths) when my ants on Cells make
+        the given moves; None if the moves collide or enter water, or a
+        Loc which passable (as in the protocol's conflict resolution) says
+        an ant may not move onto.'''
+        kernel, water = self.kernel, self.water
+        if responses is None:
+            responses = self.responses(mine, theirs)
+        step = kernel.cell_step
+        after = [step(m, v) for m, v in itertools.izip(mine, moves)]
+        if len(set(after)) < len(after) or any(water[c] for c in after):
+            return None
+        if passable:
+            locs, held = kernel.locs, set(mine)
+            if not all(c in held or passable(locs[c]) for c in after):
+                return None
+        outcomes = [self.deaths(after, response) for response in responses]
+        n = float(len(outcomes))
+        return (sum(o[0] for o in outcomes) / n,
+                sum(o[1] for o in outcomes) / n)
+
+    def search(self, mine, theirs, checkin=None, limit=64, passable=None):
+        '''Find good moves for my ants on Locs mine against enemies on Locs
+        theirs.
+
+        Tries every ant making the same move first, then improves the best
+        moves found one ant at a time, trying each of its other moves with
+        the rest held, until no single change helps, limit moves have been
+        scored or checkin() returns False. Ants do not move into water, nor
+        onto a Loc (not held by one of them) for which passable returns
+        False. Return a 3-tuple: the score (expected enemy deaths less my
+        own), expected my deaths and the list of moves aligned with mine; or
+        None if no combination was legal.
+
+        '''
+        kernel = self.kernel
+        mine = [kernel.cell(loc) for loc in mine]
+        theirs = [kernel.cell(loc) for loc in theirs]
+        water, step, locs = self.water, kernel.cell_step, kernel.locs
+        held = set(mine)
+        def open_(c):
+            return not water[c] and \
+                   (c in held or passable is None or passable(locs[c]))
+        options = [['='] + [v for v in DIRECTIONS if open_(step(m, v))]
+                   for m in mine]
+        responses = self.responses(mine, theirs)
+        best = [None] # score, my deaths, moves
+
+        def candidates():
+            for v in '=' + DIRECTIONS:
+                if all(v in o for o in options):
+                    yield [v] * len(mine)
+            improved = best[0] is not None
+            while improved:
+                improved = False
+                for i, o in enumerate(options):
+                    for v in o:
+                        before = best[0]
+                        if v != before[2][i]:
+                            moves = before[2][:]
+                            moves[i] = v
+                            yield moves
+                            improved = improved or best[0] is not before
+
+        for n, moves in enumerate(itertools.islice(candidates(), limit)):
+            if checkin and n % 16 == 15 and not checkin():
+                break
+            outcome = self.evaluate(mine, theirs, moves, responses)
+            if outcome is None:
+                continue
+            mydead, theirdead = outcome
+            score = theirdead - mydead, -mydead
+            if best[0] is None or score > best[0][0]:
+                best[0] = score, mydead, moves
+        if best[0] is None:
+            return None
+        (score, _), mydead, moves = best[0]
+        return score, mydead, moves
+
+###############################################################################
@@ -0,0 +1,76 @@
+# stdlib
+import time
+
+
+'''
+Turn-time budgets for the ants protocol.
+
+The protocol resets its Budget when a turn begins, leaving a reserve for its
+own work after the decider returns. Deciders do anytime work: they check in
+between units of work (eg. ants) and stop when the budget runs out, leaving
+the remaining ants to cheap defaults.
+
+Times are in milliseconds.
+
+'''
+
+
+# seconds from an arbitrary point; monotonic where the platform has it
+clock = getattr(time, 'monotonic', time.time)
+
+
+###############################################################################
+
+
+class Budget(object):
+    '''Time left before a deadline.
+
+    A Budget made without a time limit never runs out.
+
+    '''
+
+    def __init__(self, milliseconds=None, reserve=0.0):
+        self.total = milliseconds
+        self.reserve = reserve
+        self.start = None
+        self.deadline = None
+        self.reset()
+
+    def reset(self):
+        '''Start the clock for a new turn.'''
+        self.start = clock()
+        if self.total is None:
+            self.deadline = float('inf')
+        else:
+            self.deadline = self.start + (self.total - self.reserve) / 1000.0
+
+    def elapsed(self):
+        '''Milliseconds since the clock started.'''
+        return (clock() - self.start) * 1000.0
+
+    def remaining(self):
+        '''Milliseconds left before the deadline (never negative).'''
+        return max(self.deadline - clock(), 0.0) * 1000.0
+
+    def expired(self):
+        return clock() >= self.deadline
+
+    def checkin(self):
+        '''Is there time for another unit of work?'''
+        return clock() < self.deadline
+
+    def share(self, parts=1):
+        '''Return a Budget for an even share of the time remaining.
+
+        Splitting among n consumers in turn, the i-th consumer (counting from
+        zero) should take share(n - i) so that time one consumer leaves unused
+        carries over to the rest.
+
+        '''
+        part = Budget()
+        part.deadline = part.start + max(self.deadline - part.start, 0.0) / parts
+        if part.deadline != float('inf'):
+            part.total = (part.deadline - part.start) * 1000.0
+        return part
+
+###############################################################################
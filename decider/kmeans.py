@@ -4,6 +4,9 @@ import itertools as it
 from datetime import datetime as DateTime
 # local
 import antmath
+import budget
+import pathing
+import geometry
 
 
 '''
@@ -23,9 +26,10 @@ class Decider(object):
         self.g = {}
         self.logfn = logfn
         self.v = list('NESW')
-        # graph of shortest paths between pairs of locations
-        # net = { ... loc:{loc:(number, [vector])}, ... loc:{loc:None}, ... }
-        self.net = {}
+        # shortest paths between pairs of locations around known water
+        self.net = None
+        # time left this turn
+        self.budget = None
         # goal ages
         # age = { ... loc:age ... }
         self.age = {}
@@ -46,6 +50,13 @@ class Decider(object):
                      1**2)
         self.MYHILL = (4 ** 2,
                        8 ** 2)
+        kernel = game.get('geometry') or geometry.Kernel(self.size)
+        self.net = pathing.Paths(kernel)
+        self.budget = game.get('budget') or budget.Budget()
+
+    def discover(self, newwater):
+        '''Take the water first seen this turn.'''
+        self.net.discover(newwater)
 
     def think(self, dirt, food, enemyhill, enemyant, myhill, myant, mydead):
         '''Return a dict with the keys of myant mapped to lists of NESW=.'''
@@ -111,6 +122,7 @@ class Decider(object):
                 squads = {(r, c): myant.keys()}
 
             # assign each squad the closest goal
+            routing = True # until the turn's time runs out
             for sM, sA in squads.iteritems():
                 dist, gloc = min([self.unwrapped_dir(sM, loc) for loc in goals])
                 gradmin, gradmax = goals[self.wrap(gloc)]
@@ -122,6 +134,11 @@ class Decider(object):
                         myant[aN] = vect
                         random.shuffle(myant[aN]) if gradmax != gradmin else None
                         myant[aN] += [antmath.reverse_dir(v) for v in vect]
+                        # lead with the first step of the route around water
+                        routing = routing and self.budget.checkin()
+                        v = routing and self.net.direction(aN, gloc)
+                        if v and v != '=':
+                            myant[aN] = [v] + [u for u in myant[aN] if u != v]
                     elif dist < gradmin:
                         myant[aN] = [antmath.reverse_dir(v) for v in vect]
                         random.shuffle(myant[aN]) if gradmax != gradmin else None
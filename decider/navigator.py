@@ -2,6 +2,9 @@
 import random
 # local
 import protocol
+import geometry
+import hierarchy
+import registry
 
 
 '''
@@ -15,6 +18,9 @@ goal each turn. Eliminates goals which ants do not make progress toward.
 '''
 
 
+NOGO = 16 # most goals an ant remembers giving up on
+
+
 class Decider(object):
 
     def __init__(self, logfn=None):
@@ -23,40 +29,58 @@ class Decider(object):
         self.d = list('NESW')
         self.ds = set(self.d)
         self.maxage = 0
-        # ant goals and state
-        # ant = { ... id:(loc, [nogo]) ... }
-        self.goal = {}
-        # graph of shortest paths between pairs of locations
-        # net = { ... loc:{loc:(number, [vector])}, ... loc:{loc:None}, ... }
-        self.net = {}
+        # ant goals and state, by registry row
+        self.registry = None        # registry.Registry
+        self.owned = False          # is the registry ours to update?
+        self.rows = None            # id --> row
+        self.goal = None            # row --> goal loc or None
+        self.nogo = None            # row --> (goal locs given up on)
+        # routes between pairs of locations around known water
+        self.net = None
 
     def start(self, game):
         '''Set up the decider according to the game specifications.'''
         self.g.update(game)
         self.maxage = self.g['viewradius'] * 1.5
+        kernel = game.get('geometry') or \
+                 geometry.Kernel((game['rows'], game['cols']))
+        self.net = hierarchy.Hierarchy(kernel)
+        # the protocol's registry, or one of our own to keep up to date
+        shared = game.get('registry')
+        self.owned = shared is None
+        self.registry = registry.Registry(kernel) if self.owned else shared
+        self.rows = self.registry.rows
+        self.goal = self.registry.column('navigator goal')
+        self.nogo = self.registry.column('navigator nogo', ())
+
+    def discover(self, newwater):
+        '''Take the water first seen this turn.'''
+        self.net.discover(newwater)
 
     def think(self, dirt, food, enemyhill, enemyant, myhill, myant, mydead):
         '''Return a dict with the keys of myant mapped to lists of NESW=.'''
-        d = Decider.distance2
         #if self.logfn:
         #    self.logfn('\n' + self._make_map(
         #        dirt, food, enemyhill, enemyant, myhill, myant, mydead))
+        if self.owned:
+            self.registry.update(myant, mydead)
         goals = {}
         goals.update(food)
         goals.update(enemyant)
         goals.update(enemyhill)
         for aN, (aI, aO) in myant.iteritems():
-            gloc, nogo = self.goal[aI] if aI in self.goal else (None, [])
+            row = self.rows[aI]
+            gloc, nogo = self.goal[row], self.nogo[row]
             # does the goal exist?
             if gloc in goals:
                 # did the ant get closer?
-                if d(gloc, aN) < d(gloc, aO):
+                if self.closer(aO, aN, gloc):
                     # move closer still
-                    self.goal[aI] = (gloc, nogo)
-                    myant[aN] = Decider.naive_path(aN, gloc)
+                    myant[aN] = self.path(aN, gloc)
                 else:
                     # forget that goal
-                    self.goal[aI] = gloc, nogo = (None, nogo + [gloc])
+                    nogo = self.nogo[row] = (nogo + (gloc,))[-NOGO:]
+                    gloc = self.goal[row] = None
             # is the goal a fantasy?
             if gloc not in goals:
                 # find the nearest one not in nogo
@@ -65,8 +89,8 @@ class Decider(object):
                 if gloc:
                     # set goal and move there
                     del goals[gloc]
-                    self.goal[aI] = (gloc, nogo)
-                    myant[aN] = Decider.naive_path(aN, gloc)
+                    self.goal[row] = gloc
+                    myant[aN] = self.path(aN, gloc)
                 else:
                     # move randomly
                     random.shuffle(self.d)
@@ -75,6 +99,23 @@ class Decider(object):
                 #    ant, myant[loc], self.ant[ant] if ant in self.ant else 'explore'))
         return myant
 
+    def path(self, a, b):
+        '''Vectors from loc a toward loc b, following the net if it can.'''
+        vectors = Decider.naive_path(a, b)
+        v = self.net.direction(a, b)
+        if v and v != '=':
+            vectors = [v] + [u for u in vectors if u != v]
+        return vectors
+
+    def closer(self, old, new, goal):
+        '''Did an ant moving from old to new get closer to its goal?'''
+        before = self.net.distance(old, goal)
+        after = self.net.distance(new, goal)
+        if before is None or after is None:
+            d = Decider.distance2
+            return d(goal, new) < d(goal, old)
+        return after < before
+
     def extend(self, vectors):
         return self.vectors + list(self.ds.difference(vectors))
 
@@ -0,0 +1,483 @@
+# stdlib
+import sys
+import time
+import random
+import itertools
+import multiprocessing
+# local
+import antmath
+import protocol
+import decider
+
+
+'''
+Headless game engine for the 2011 Google AI Challenge "ants" game.
+
+Plays whole games in-process against protocol.Bot instances, without the
+official tools, subprocesses or pipes. Each turn follows the official order:
+
+    move    -- ants follow orders; ants may not enter water or food, and ants
+               which end up on the same square all die
+    attack  -- "focus" rule: an ant dies if any enemy within attack range is
+               engaged by no more enemies than the ant itself
+    raze    -- an enemy ant standing on a live hill razes it (+2 to the
+               razer, -1 to the owner)
+    spawn   -- one ant per unoccupied live hill while the owner has food
+    gather  -- food within spawn range of exactly one player's ants is
+               collected; contested food is destroyed
+    food    -- new food appears on random land (copied to every symmetric
+               position on generated maps)
+
+Players only hear about what their ants can see (fog of war), and only hear
+about a water square the first time they see it.
+
+A MapData is a dictionary:
+    rows, cols, players     int
+    water, food             set<Loc>
+    hills, ants             dict<Loc, int>  (owner)
+    symmetry                list<(int, int)>  (translations mapping one
+                                               player's start onto the others)
+
+'''
+
+
+DIRECTIONS = {'N': (-1, 0), 'E': (0, 1), 'S': (1, 0), 'W': (0, -1)}
+
+DEFAULTS = {
+    'loadtime'      : 3000,
+    'turntime'      : 500,
+    'turns'         : 500,
+    'viewradius2'   : 77,
+    'attackradius2' : 5,
+    'spawnradius2'  : 1,
+    'foodrate'      : 0.25, # expected food per player per turn
+}
+
+
+###############################################################################
+
+
+def disc(radius2):
+    '''Return the list of (drow, dcol) offsets within a squared radius.'''
+    radius = int(radius2 ** 0.5)
+    return [(dr, dc) for dr in xrange(-radius, radius + 1)
+                     for dc in xrange(-radius, radius + 1)
+                     if dr * dr + dc * dc <= radius2]
+
+
+def parse_map(text):
+    '''Parse a map in the official tools' format into MapData.'''
+    data = {'rows': None, 'cols': None, 'players': None,
+            'water': set(), 'food': set(), 'hills': {}, 'ants': {},
+            'symmetry': [(0, 0)]}
+    row = 0
+    for line in text.splitlines():
+        tok = line.strip().split(None, 1)
+        if len(tok) < 2:
+            continue
+        key = tok[0].lower()
+        if key in ('rows', 'cols', 'players'):
+            data[key] = int(tok[1])
+        elif key == 'm':
+            for col, ch in enumerate(tok[1]):
+                loc = row, col
+                if ch == '%':
+                    data['water'].add(loc)
+                elif ch == '*':
+                    data['food'].add(loc)
+                elif '0' <= ch <= '9':
+                    data['hills'][loc] = ord(ch) - ord('0')
+                elif 'a' <= ch <= 'j':
+                    data['ants'][loc] = ord(ch) - ord('a')
+                elif 'A' <= ch <= 'J':
+                    data['hills'][loc] = ord(ch) - ord('A')
+                    data['ants'][loc] = ord(ch) - ord('A')
+            row += 1
+    return data
+
+
+def generate_map(rows, cols, players, rng, density=0.15):
+    '''Generate a random MapData which is fair by translational symmetry.
+
+    Each player gets one hill (with an ant on it); water and starting food
+    are repeated at every player's offset.
+
+    '''
+    symmetry = [(p * rows // players, p * cols // players)
+                for p in xrange(players)]
+    def copies(loc):
+        return [antmath.wrap_loc((loc[0] + dr, loc[1] + dc), (rows, cols))
+                for dr, dc in symmetry]
+    hill0 = rng.randrange(rows), rng.randrange(cols)
+    clear = set()
+    for dr, dc in disc(3 ** 2):
+        clear.update(copies((hill0[0] + dr, hill0[1] + dc)))
+    water = set()
+    for _ in xrange(int(rows * cols * density / players / 6) + 1):
+        loc = rng.randrange(rows), rng.randrange(cols)
+        for _ in xrange(6):
+            water.update(copies(loc))
+            dr, dc = DIRECTIONS[rng.choice('NESW')]
+            loc = loc[0] + dr, loc[1] + dc
+    water -= clear
+    hills = {}
+    for p, loc in enumerate(copies(hill0)):
+        hills[loc] = p
+    food = set()
+    for dr, dc in rng.sample(disc(3 ** 2), 2):
+        if (dr, dc) != (0, 0):
+            food.update(copies((hill0[0] + dr, hill0[1] + dc)))
+    return {'rows': rows, 'cols': cols, 'players': players,
+            'water': water, 'food': food, 'hills': hills,
+            'ants': dict(hills), 'symmetry': symmetry}
+
+
+###############################################################################
+
+
+class Game(object):
+    '''State and rules of one game.'''
+
+    def __init__(self, mapdata, seed=0, **options):
+        self.options = dict(DEFAULTS)
+        self.options.update(options)
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.rows = mapdata['rows']
+        self.cols = mapdata['cols']
+        self.players = mapdata['players']
+        self.symmetry = mapdata.get('symmetry', [(0, 0)])
+        self.water = set(mapdata['water'])
+        self.food = set(mapdata['food'])
+        self.ants = dict(mapdata['ants'])           # Loc --> owner
+        self.hills = dict(mapdata['hills'])         # Loc --> owner
+        self.razed = set()                          # Locs of razed hills
+        self.spawned = {loc: 0 for loc in self.hills}   # Loc --> turn
+        self.hive = [0] * self.players              # food stockpiles
+        self.dead = {}                              # Loc --> owner (turn)
+        self.seen = [set() for _ in xrange(self.players)]   # water told
+        self.scores = [0] * self.players
+        for owner in self.hills.itervalues():
+            self.scores[owner] += 1
+        self.turn = 0
+        self.view = disc(self.options['viewradius2'])
+        self.attack = [o for o in disc(self.options['attackradius2'])
+                       if o != (0, 0)]
+        self.spawn = disc(self.options['spawnradius2'])
+
+    def wrap(self, loc):
+        return loc[0] % self.rows, loc[1] % self.cols
+
+    def owner(self, owner, player):
+        '''Renumber an owner from a player's point of view (self is 0).'''
+        return (owner - player) % self.players
+
+    def alive(self, player):
+        '''Is the player still in the game?'''
+        return player in self.ants.itervalues() or \
+               (self.hive[player] > 0 and any(
+                   o == player and loc not in self.razed
+                   for loc, o in self.hills.iteritems()))
+
+    def over(self):
+        return self.turn >= self.options['turns'] or \
+               sum(1 for p in xrange(self.players) if self.alive(p)) <= 1
+
+    #
+    # messages
+
+    def setup(self, player):
+        '''Return the game-start message block for a player.'''
+        o = self.options
+        lines = ['turn 0']
+        for key in ('loadtime', 'turntime'):
+            lines.append('{} {}'.format(key, o[key]))
+        lines.append('rows {}'.format(self.rows))
+        lines.append('cols {}'.format(self.cols))
+        lines.append('turns {}'.format(o['turns']))
+        for key in ('viewradius2', 'attackradius2', 'spawnradius2'):
+            lines.append('{} {}'.format(key, o[key]))
+        lines.append('player_seed {}'.format(self.rng.randrange(1 << 30)))
+        lines.append('ready')
+        return '\n'.join(lines) + '\n'
+
+    def visible(self, player):
+        '''Return the set of Locs the player's ants can see.'''
+        wrap = self.wrap
+        seen = set()
+        for (r, c), owner in self.ants.iteritems():
+            if owner == player:
+                seen.update(wrap((r + dr, c + dc)) for dr, dc in self.view)
+        return seen
+
+    def state(self, player):
+        '''Return the turn message block for a player.'''
+        visible = self.visible(player)
+        lines = ['turn {}'.format(self.turn)]
+        news = (visible & self.water) - self.seen[player]
+        self.seen[player].update(news)
+        lines.extend('w {} {}'.format(r, c) for r, c in news)
+        lines.extend('f {} {}'.format(r, c) for r, c in visible & self.food)
+        for (r, c), o in self.hills.iteritems():
+            if (r, c) in visible and (r, c) not in self.razed:
+                lines.append('h {} {} {}'.format(r, c, self.owner(o, player)))
+        for (r, c), o in self.ants.iteritems():
+            if (r, c) in visible:
+                lines.append('a {} {} {}'.format(r, c, self.owner(o, player)))
+        for (r, c), o in self.dead.iteritems():
+            if (r, c) in visible:
+                lines.append('d {} {} {}'.format(r, c, self.owner(o, player)))
+        lines.append('go')
+        return '\n'.join(lines) + '\n'
+
+    def orders(self, player, replies):
+        '''Parse a player's replies into a dict Loc --> direction.'''
+        orders = {}
+        for line in replies or ():
+            tok = line.split()
+            if len(tok) == 4 and tok[0] == 'o' and tok[3] in DIRECTIONS:
+                loc = int(tok[1]), int(tok[2])
+                if self.ants.get(loc) == player and loc not in orders:
+                    orders[loc] = tok[3]
+        return orders
+
+    #
+    # rules
+
+    def finish_turn(self, orders):
+        '''Apply every player's orders and resolve the turn.'''
+        self.dead = {}
+        self.do_moves(orders)
+        self.do_attack()
+        self.do_raze()
+        self.do_spawn()
+        self.do_gather()
+        self.do_food()
+
+    def do_moves(self, orders):
+        moved = {}                                  # Loc --> [owner]
+        for loc, owner in self.ants.iteritems():
+            dest = loc
+            if loc in orders:
+                dr, dc = DIRECTIONS[orders[loc]]
+                dest = self.wrap((loc[0] + dr, loc[1] + dc))
+                if dest in self.water or dest in self.food:
+                    dest = loc
+            moved.setdefault(dest, []).append(owner)
+        self.ants = {}
+        for loc, owners in moved.iteritems():
+            if len(owners) == 1:
+                self.ants[loc] = owners[0]
+            else:
+                self.dead[loc] = owners[0]
+
+    def do_attack(self):
+        wrap, ants = self.wrap, self.ants
+        enemies = {}                                # Loc --> [Loc]
+        for (r, c), owner in ants.iteritems():
+            enemies[r, c] = [e for e in (wrap((r + dr, c + dc))
+                                         for dr, dc in self.attack)
+                             if e in ants and ants[e] != owner]
+        doomed = [loc for loc, es in enemies.iteritems()
+                  if any(len(enemies[e]) <= len(es) for e in es)]
+        for loc in doomed:
+            self.dead[loc] = ants.pop(loc)
+
+    def do_raze(self):
+        for loc, owner in self.hills.iteritems():
+            if loc not in self.razed and loc in self.ants and \
+               self.ants[loc] != owner:
+                self.razed.add(loc)
+                self.scores[self.ants[loc]] += 2
+                self.scores[owner] -= 1
+
+    def do_spawn(self):
+        hills = sorted((turn, loc) for loc, turn in self.spawned.iteritems()
+                       if loc not in self.razed)
+        for _, loc in hills:
+            owner = self.hills[loc]
+            if self.hive[owner] and loc not in self.ants:
+                self.hive[owner] -= 1
+                self.ants[loc] = owner
+                self.spawned[loc] = self.turn
+
+    def do_gather(self):
+        wrap = self.wrap
+        for r, c in list(self.food):
+            owners = set(self.ants[n] for n in (wrap((r + dr, c + dc))
+                                                for dr, dc in self.spawn)
+                         if n in self.ants)
+            if owners:
+                self.food.discard((r, c))
+                if len(owners) == 1:
+                    self.hive[owners.pop()] += 1
+
+    def do_food(self):
+        rate = self.options['foodrate'] * self.players / len(self.symmetry)
+        count = int(rate) + (self.rng.random() < rate - int(rate))
+        for _ in xrange(count):
+            r, c = self.rng.randrange(self.rows), self.rng.randrange(self.cols)
+            for dr, dc in self.symmetry:
+                loc = self.wrap((r + dr, c + dc))
+                if loc not in self.water and loc not in self.ants and \
+                   loc not in self.hills:
+                    self.food.add(loc)
+
+    #
+    # driver
+
+    def play(self, bots):
+        '''Play the game to the end with one protocol.Bot per player.
+
+        As in the official tools, a bot which raises an exception is out of
+        the game: its ants stay where they are and it gives no more orders.
+
+        Return a result dictionary.
+
+        '''
+        start = time.time()
+        errors = [None] * self.players
+        def tell(player, block):
+            try:
+                return bots[player].handle_block(block)
+            except Exception as e:
+                errors[player] = '{}: {}'.format(type(e).__name__, e)
+        for player in xrange(self.players):
+            tell(player, self.setup(player))
+        while not self.over():
+            self.turn += 1
+            orders = {}
+            for player in xrange(self.players):
+                if self.alive(player) and errors[player] is None:
+                    replies = tell(player, self.state(player))
+                    orders.update(self.orders(player, replies))
+            self.finish_turn(orders)
+        end = 'end\nplayers {}\nscore {}\n'.format(
+            self.players, ' '.join(str(score) for score in self.scores))
+        for player in xrange(self.players):
+            if errors[player] is None:
+                tell(player, end)
+        counts = [0] * self.players
+        for owner in self.ants.itervalues():
+            counts[owner] += 1
+        best = max(self.scores)
+        winners = [p for p, s in enumerate(self.scores) if s == best]
+        return {
+            'seed'      : self.seed,
+            'turns'     : self.turn,
+            'scores'    : self.scores[:],
+            'ants'      : counts,
+            'winner'    : winners[0] if len(winners) == 1 else None,
+            'errors'    : errors,
+            'seconds'   : time.time() - start,
+        }
+
+
+###############################################################################
+
+
+def selfplay(job):
+    '''Play one seeded game on a generated map. Picklable for a pool.
+
+    job -- tuple of (seed, list of decider names, dict of options)
+
+    '''
+    seed, names, options = job
+    options = dict(options)
+    rows = options.pop('rows', 48)
+    cols = options.pop('cols', 48)
+    grid = options.pop('grid', False)
+    cells = options.pop('cells', False)
+    rng = random.Random(seed)
+    mapdata = generate_map(rows, cols, len(names), rng)
+    game = Game(mapdata, rng.randrange(1 << 30), **options)
+    bots = [protocol.Bot(decider.DECIDERS[name](None), None, grid, None, cells)
+            for name in names]
+    result = game.play(bots)
+    result['seed'] = seed
+    result['names'] = list(names)
+    return result
+
+
+def run(names, games, seed=0, processes=None, **options):
+    '''Play many seeded games, in parallel on a process pool.
+
+    Yield result dictionaries as games finish.
+
+    '''
+    jobs = [(seed + i, names, options) for i in xrange(games)]
+    pool = None
+    if processes != 1:
+        try:
+            pool = multiprocessing.Pool(processes)
+        except (OSError, ImportError):
+            pool = None # no pool here; play serially
+    if pool is None:
+        for result in itertools.imap(selfplay, jobs):
+            yield result
+        return
+    try:
+        for result in pool.imap_unordered(selfplay, jobs):
+            yield result
+    finally:
+        pool.terminate()
+
+
+def main():
+    '''Play games between deciders and summarize the results.
+
+    python engine.py [options] DECIDER DECIDER [DECIDER ...]
+
+    '''
+    args = sys.argv[1:]
+    def option(flag, default, kind=int):
+        if flag in args:
+            i = args.index(flag)
+            args.pop(i)
+            try:
+                return kind(args.pop(i))
+            except (IndexError, ValueError):
+                raise ValueError('{} option requires an argument'.format(flag))
+        return default
+    games = option('--games', 8)
+    seed = option('--seed', 0)
+    processes = option('--processes', None)
+    options = {}
+    options['rows'] = option('--rows', 48)
+    options['cols'] = option('--cols', 48)
+    for key in ('turns', 'turntime'):
+        value = option('--' + key, None)
+        if value is not None:
+            options[key] = value
+    for flag in ('grid', 'cells'):
+        if '--' + flag in args:
+            args.remove('--' + flag)
+            options[flag] = True
+    names = args
+    if len(names) < 2 or any(n not in decider.DECIDERS for n in names):
+        raise ValueError('need two or more deciders from: {}'.format(
+            ', '.join(sorted(decider.DECIDERS))))
+    #
+    start = time.time()
+    wins = [0] * len(names)
+    draws = turns = 0
+    for result in run(names, games, seed, processes, **options):
+        turns += result['turns']
+        if result['winner'] is None:
+            draws += 1
+        else:
+            wins[result['winner']] += 1
+        sys.stdout.write('seed {seed} turns {turns} scores {scores} '
+                         'ants {ants} {seconds:.1f}s\n'.format(**result))
+        for name, error in zip(names, result['errors']):
+            if error:
+                sys.stdout.write('    {} crashed: {}\n'.format(name, error))
+    elapsed = time.time() - start
+    for name, won in zip(names, wins):
+        sys.stdout.write('{:>10} won {}/{}\n'.format(name, won, games))
+    sys.stdout.write('{} draws; {:.2f} games/s, {:.1f} turns/s\n'.format(
+        draws, games / elapsed, turns / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,17 @@
 import datetime
 import random
 import itertools
+import math
 # local
 import antmath as am
+import budget
+import fields
+import geometry
+import hierarchy
+import influence
+import instrument
+import sight
+import spatial
 
 
 '''
@@ -45,9 +54,11 @@ class LazyEnvDigest(object):
 
     '''
 
-    def __init__(self, size, radius, logfn):
+    def __init__(self, size, radius, logfn, kernel=None, spans=None):
         self.logfn = logfn
+        self.spans = spans or instrument.Spans(enabled=False)
         self.size = size
+        self.geometry = kernel or geometry.Kernel(size)
         self.rad = radius
         self.rad2 = radius ** 2
         self.nneR = set(xrange(int(round(self.rad)),
@@ -64,8 +75,11 @@ class LazyEnvDigest(object):
             'myant'     :{},
             'mydead'    :{},
         }
-        self.rays = {}          # wLoc, wLoc --> bool
-        self.envwater = set()
+        self.sight = sight.Sight(size, self.rad2) # cached line of sight
+        self.envwater = set()   # every wLoc of water seen so far
+        self.discovered = False # was this turn's new water given already?
+        self.subscribers = []   # functions of list<wLoc> of new water
+        self.subscribe(self.sight.discover)
         self.__myid = None      # id --> wLoc, old_wLoc
         self.__mydeadid = None  # id --> wLoc, old_wLoc
         # ant perspective data
@@ -78,23 +92,34 @@ class LazyEnvDigest(object):
             'myant'     :{},
             'mydead'    :{},
         }
+        self.index = {}         # str --> spatial.BucketIndex (this turn)
+        self.batch = {}         # str --> spatial.Perspectives (this turn)
+        self.fields = {}        # str, limit --> fields.Field (this turn)
+        self.routes = {}        # str, limit --> frozenset<Cell>, fields.Field
+        self.subscribe(lambda newwater: self.routes.clear())
+        self.influences = {}    # str, rad2 --> influence.Influence (this turn)
+        self.queries = {}       # name, str, ... --> derived fact (this turn)
+        # routes around known water, kept across turns once asked for
+        self.__paths = None     # hierarchy.Hierarchy
+        cellcount = size[0] * size[1]
+        self.unseen = bytearray([1]) * cellcount # Cell --> never in sight?
+        self.seenfrom = set()   # Cells whose surroundings are marked seen
         self.supplemental = {}  # moves to supplement partial strategies
+        self.forgotten = set()  # layers hidden for the rest of the turn
+        self.priority = None    # ids of my ants, most urgent first (this turn)
+        self.budget = budget.Budget() # time allowed for the current consumer
 
     #
     # curried
 
     def wrap(self, loc):
-        return am.wrap_loc(loc, self.size)
+        return self.geometry.wrap_loc(loc)
 
     def unwrap(self, a, b):
-        if self.not_near_edge(a):
-            return b
-        else:
-            d2, unwr = am.nearest_unwrapped_loc(a, self.size, b)
-            return unwr
+        return self.geometry.unwrap(a, b)
 
     def allinradius(self, loc):
-        return am.allinradius(self.rad, loc)
+        return self.geometry.allinradius(self.rad, loc)
 
     #
     # shortened
@@ -127,8 +152,14 @@ class LazyEnvDigest(object):
 
     def update_env(self,
                    water, food, enemyhill, enemyant, myhill, myant, mydead):
+        '''Take the new turn's layers.
+
+        Unless discover() was called first, new water is found by comparing
+        the water layer against all water seen before.
+
+        '''
         # environment data
-        self.env = {
+        layers = {
             'water'     :water,
             'food'      :food,
             'enemyhill' :enemyhill,
@@ -137,41 +168,104 @@ class LazyEnvDigest(object):
             'myant'     :myant,
             'mydead'    :mydead,
         }
-        self.envwater = self.envwater | water.viewkeys()
+        self.env = layers
+        if self.discovered:
+            self.discovered = False
+        else:
+            self.learn(water.viewkeys() - self.envwater)
         self.__myid = None
         self.__mydeadid = None
         # ant perspective data
         for apm in self.persp.itervalues():
             apm.clear()
+        self.index.clear()
+        self.batch.clear()
+        self.fields.clear()
+        self.influences.clear()
+        self.queries.clear()
         self.supplemental.clear()
+        self.forgotten.clear()
+        self.priority = None
+
+    def discover(self, newwater):
+        '''Take this turn's newly seen water ahead of update_env.'''
+        self.learn(newwater)
+        self.discovered = True
+
+    def learn(self, newwater):
+        '''Record new water and pass the wLocs on to the subscribers.'''
+        newwater = [k for k in newwater if k not in self.envwater]
+        if not newwater:
+            return
+        self.envwater.update(newwater)
+        for fn in self.subscribers:
+            fn(newwater)
+
+    def subscribe(self, fn):
+        '''Call fn with the list of wLocs of water whenever more is seen.'''
+        self.subscribers.append(fn)
+
+    def forget(self, key):
+        '''Hide a layer of the environment for the rest of the turn.'''
+        self.env[key] = {}
+        self.forgotten.add(key)
+        self.persp[key].clear()
+        self.index.pop(key, None)
+        self.batch.pop(key, None)
+        for cache in (self.fields, self.influences):
+            for k in [k for k in cache if k[0] == key]:
+                del cache[k]
+        for k in [k for k in self.queries if k[1] == key]:
+            del self.queries[k]
+
+    def setaside(self, ids):
+        '''Hide some of my ants (by id) for the rest of the turn.'''
+        myid, myant = self.myid, self.myant
+        for aI in ids:
+            myant.pop(myid[aI][0], None)
+        self.__myid = None
+        self.persp['myant'].clear()
+        self.index.pop('myant', None)
+        self.batch.pop('myant', None) # others still cover the ants left
+        for cache in (self.fields, self.influences):
+            for k in [k for k in cache if k[0] == 'myant']:
+                del cache[k]
+        for k in [k for k in self.queries if k[1] == 'myant']:
+            del self.queries[k]
+        if self.priority is not None:
+            self.priority = [aI for aI in self.priority if aI in self.myid]
+
+    def layer(self, key):
+        '''Return a layer of the environment: wLoc --> metadata.'''
+        return self.env[key]
 
     @property
     def water(self):
-        return self.env['water']
+        return self.layer('water')
 
     @property
     def food(self):
-        return self.env['food']
+        return self.layer('food')
 
     @property
     def enemyhill(self):
-        return self.env['enemyhill']
+        return self.layer('enemyhill')
 
     @property
     def enemyant(self):
-        return self.env['enemyant']
+        return self.layer('enemyant')
 
     @property
     def myhill(self):
-        return self.env['myhill']
+        return self.layer('myhill')
 
     @property
     def myant(self):
-        return self.env['myant']
+        return self.layer('myant')
 
     @property
     def mydead(self):
-        return self.env['mydead']
+        return self.layer('mydead')
 
     @property
     def myid(self):
@@ -180,6 +274,15 @@ class LazyEnvDigest(object):
                 aI: (aN, aO) for aN, (aI, aO) in self.myant.iteritems()}
         return self.__myid
 
+    @property
+    def paths(self):
+        '''Routes around the water seen so far, built on first use.'''
+        if self.__paths is None:
+            self.__paths = hierarchy.Hierarchy(self.geometry,
+                                               self.sight.water)
+            self.subscribe(self.__paths.discover)
+        return self.__paths
+
     @property
     def mydeadid(self):
         if self.__mydeadid is None:
@@ -187,65 +290,191 @@ class LazyEnvDigest(object):
                 aI: (aN, aO) for aN, (aI, aO) in self.mydead.iteritems()}
         return self.__mydeadid
 
+    def ants(self):
+        '''Iterate (id, (wLoc, old_wLoc)) for my ants while time remains.
+
+        Ants come most urgent first when a priority is set. Ants left over
+        when the budget runs out get no advice.
+
+        '''
+        checkin = self.budget.checkin
+        myid = self.myid
+        if self.priority is None:
+            items = myid.iteritems()
+        else:
+            items = ((aI, myid[aI]) for aI in self.priority)
+        for item in items:
+            if not checkin():
+                break
+            yield item
+
+    def indexed(self, key):
+        '''Return this turn's spatial index of a layer, built on demand.'''
+        try:
+            return self.index[key]
+        except KeyError:
+            index = spatial.BucketIndex(self.size, self.layer(key), self.rad)
+            self.index[key] = index
+            return index
+
     def digest(self, key, aloc):
         '''Digest an ant's environment for object presence.
         str wLoc --> list<Goals>
+
+        An ant does not see itself among the 'myant' goals.
         '''
         aloc = self.wrap(aloc)
         apm = self.persp[key] # wLoc --> (bool, list<Goal>)
         if aloc not in apm:
-            goals = [] # list<Goal>
+            batch = self.batch.get(key)
+            if batch is not None and aloc in batch.row:
+                goals = batch.goals(aloc)
+            else:
+                goals = self.indexed(key).near(aloc, self.rad2)
+                if key == 'myant' and goals and aloc == goals[0][1]:
+                    goals.pop(0)
             apm[aloc] = False, goals
-            for gloc in self.env[key]:
-                #gloc = self.unwrap(aloc, gloc)
-                d2 = self.dist2(aloc, gloc)
-                if d2 <= self.rad2:
-                    goals.append((d2, gloc))
-            if key == 'myant' and goals and aloc == goals[0][1]:
-                goals.pop(0)
-            goals.sort()
         return apm[aloc][1]
 
-    def ray(self, origin, target):
-        '''Is there a direct path from the origin to the target?'''
-        origin = self.wrap(self.int(origin))
-        target = self.unwrap(origin, self.int(target))
+    def perspectives(self, key):
+        '''Digest every one of my ants' perspectives of a layer at once.
+        str --> spatial.Perspectives (onlookers are my ants' wLocs)
+
+        Computed once per turn; digest() answers from it afterward.
+        '''
+        try:
+            return self.batch[key]
+        except KeyError:
+            batch = self.indexed(key).perspectives(
+                self.myant, self.rad2, exclude=(key == 'myant'))
+            self.batch[key] = batch
+            return batch
 
-        # return a stored answer
+    def field(self, key, limit=None):
+        '''Distance field toward a layer's objects or the unexplored map.
+        str --> fields.Field
+
+        key is a layer name or 'frontier' for cells never within sight of
+        my ants. Fields route around known water, reach out limit steps (or
+        across the map) and are computed once per turn, on first request.
+        Last turn's field is kept if neither its sources nor the known water
+        have changed since.
+
+        '''
         try:
-            return self.rays[origin, target]
+            return self.fields[key, limit]
         except KeyError:
             pass
+        if key == 'frontier':
+            sources = frozenset(self.frontier())
+        else:
+            sources = frozenset(self.layercells(key))
+        try:
+            previous, field = self.routes[key, limit]
+        except KeyError:
+            previous = None
+        if sources != previous:
+            field = fields.Field(self.geometry, self.sight.water, sources,
+                                 limit)
+            self.routes[key, limit] = sources, field
+        self.fields[key, limit] = field
+        return field
 
-        # trivial
-        if origin == target:
-            return True
-
-        # don't check long paths
-        if self.dist2(origin, target) > self.rad2:
-            return False
-
-        # check path
-        o = [origin]
-        t = [target]
-        # this loop has a bug and sometimes ran forever as a while loop
-        # changed it to a for loop because the contest end was near!
-        for _ in xrange(150):
-            v, _ = am.naive_dir(o[-1], t[-1])
-            o.append(self.wrap(am.displace_loc(v, o[-1])))
-            t.append(self.unwrap(o[-1], t[-1]))
-            if o[-1] == t[-1]:
-                break
+    def influence(self, key, rad2):
+        '''How many of a layer's objects are within rad2 of each cell.
+        str number --> influence.Influence
 
-        # did the path pass through water?
-        if self.water.viewkeys() & o:
-            return False
+        Eg. influence('enemyant', attackradius2) is the per-cell threat.
+        Computed once per turn, on first request.
 
-        # remember the result
-        for co, ct in itertools.izip(o[:-1], t[:-1]):
-            self.rays[co, ct] = True
+        '''
+        try:
+            return self.influences[key, rad2]
+        except KeyError:
+            counts = influence.Influence(self.geometry, self.layercells(key),
+                                         rad2)
+            self.influences[key, rad2] = counts
+            return counts
+
+    def query(self, name, args, compute):
+        '''Return compute(*args), computed once per turn for the name and
+        arguments and shared by every consumer after.
+
+        The first argument is a layer name. Hits and misses are counted in
+        the spans as "query <name> hit" and "query <name> miss".
+
+        '''
+        key = (name,) + args
+        counted = self.spans.enabled
+        try:
+            value = self.queries[key]
+        except KeyError:
+            counted and self.spans.count('query ' + name + ' miss')
+            value = self.queries[key] = compute(*args)
+            return value
+        counted and self.spans.count('query ' + name + ' hit')
+        return value
+
+    def nearest(self, key, loc):
+        '''Nearest of a layer's objects within view of a wLoc.
+        str wLoc --> Goal or None'''
+        return self.query('nearest', (key, loc), self.find_nearest)
+
+    def find_nearest(self, key, loc):
+        if loc in self.myant:
+            return self.perspectives(key).nearest(loc)
+        goals = self.digest(key, loc)
+        return goals[0] if goals else None
+
+    def count(self, key, loc, rad2=None):
+        '''How many of a layer's objects are within rad2 (or view) of a wLoc.
+        str wLoc number --> int'''
+        return self.query('count', (key, loc, rad2), self.find_count)
+
+    def find_count(self, key, loc, rad2):
+        if rad2 is not None:
+            return self.influence(key, rad2).at(loc)
+        if loc in self.myant:
+            return self.perspectives(key).count(loc)
+        return len(self.digest(key, loc))
+
+    def centroid(self, key):
+        '''Mean (row, col) of a layer's objects, not minding the wrap.
+        str --> (float, float) or None'''
+        return self.query('centroid', (key,), self.find_centroid)
+
+    def find_centroid(self, key):
+        layer = self.layer(key)
+        if not layer:
+            return None
+        n = float(len(layer))
+        return (math.fsum(r for r, c in layer) / n,
+                math.fsum(c for r, c in layer) / n)
+
+    def layercells(self, key):
+        '''Iterate the Cells of a layer's objects.'''
+        cell = self.geometry.cell
+        return (cell(loc) for loc in self.layer(key))
+
+    def frontier(self):
+        '''Return the Cells that have never been within sight of my ants.'''
+        kernel = self.geometry
+        h, w = kernel.rows, kernel.cols
+        unseen, seenfrom = self.unseen, self.seenfrom
+        here = (kernel.cell(loc) for loc in self.myant)
+        offsets = None
+        for cell in here:
+            if cell not in seenfrom:
+                seenfrom.add(cell)
+                offsets = offsets or kernel.offsets(self.rad2)
+                r, c = kernel.locs[cell]
+                for dr, dc in offsets:
+                    unseen[(r + dr) % h * w + (c + dc) % w] = 0
+        return itertools.compress(xrange(len(unseen)), unseen)
 
-        return self.rays[origin, target]
+    def ray(self, origin, target):
+        '''Is there a direct path from the origin to the target?'''
+        return self.sight.ray(self.wrap(self.int(origin)), self.int(target))
 
 ##    def supplement(self, moves):
 ##        '''Supplement an ant's orders with a random or fixed vector.'''
@@ -0,0 +1,99 @@
+# stdlib
+from array import array
+
+
+'''
+Breadth-first distance fields on the torus for the ants bots.
+
+A Field holds, for every cell of the map, the number of steps to the nearest
+of a set of source cells and the direction of the first step along a
+shortest path to it, walking around known water. A Field is computed in one
+multi-source breadth-first pass, after which any ant's distance and best
+move toward the sources are single array lookups.
+
+Cells are geometry.Kernel Cells.
+
+'''
+
+
+# code stored per cell --> direction; 0 means "stay" (a source or unreached)
+DIRECTIONS = '=NESW'
+
+# k, the position of a neighbor in a Kernel.neighbor_cells row (NESW) -->
+# code of the direction from that neighbor back to the cell
+BACK = (3, 4, 1, 2)
+
+
+###############################################################################
+
+
+def bfs(kernel, water, sources, limit=None):
+    '''Return the distance and direction arrays of a multi-source BFS.
+
+    kernel  -- geometry.Kernel
+    water   -- bytearray; nonzero cells are impassable
+    sources -- iterable of Cells
+    limit   -- stop after this many steps (None: cover the map)
+
+    Unreached cells have distance -1.
+
+    '''
+    neighbor_cells = kernel.neighbor_cells
+    dist = array('l', [-1]) * len(neighbor_cells)
+    step = bytearray(len(neighbor_cells))
+    frontier = []
+    for cell in sources:
+        if dist[cell] < 0 and not water[cell]:
+            dist[cell] = 0
+            frontier.append(cell)
+    bn, be, bs, bw = BACK
+    d = 0
+    while frontier and (limit is None or d < limit):
+        d += 1
+        reached = []
+        for cell in frontier:
+            n, e, s, w = neighbor_cells[cell]
+            if dist[n] < 0 and not water[n]:
+                dist[n] = d
+                step[n] = bn
+                reached.append(n)
+            if dist[e] < 0 and not water[e]:
+                dist[e] = d
+                step[e] = be
+                reached.append(e)
+            if dist[s] < 0 and not water[s]:
+                dist[s] = d
+                step[s] = bs
+                reached.append(s)
+            if dist[w] < 0 and not water[w]:
+                dist[w] = d
+                step[w] = bw
+                reached.append(w)
+        frontier = reached
+    return dist, step
+
+
+class Field(object):
+    '''Distances to, and first steps toward, the nearest of some sources.'''
+
+    def __init__(self, kernel, water, sources, limit=None):
+        self.kernel = kernel
+        self.dist, self.step = bfs(kernel, water, sources, limit)
+
+    def distance(self, loc):
+        '''Steps from a Loc to the nearest source or None if unreachable.'''
+        d = self.dist[self.kernel.cell(loc)]
+        return None if d < 0 else d
+
+    def direction(self, loc):
+        '''First NESW step from a Loc toward the nearest source.
+
+        Return '=' at a source and None if no source is reachable.
+
+        '''
+        cell = self.kernel.cell(loc)
+        if self.dist[cell] < 0:
+            return None
+        return DIRECTIONS[self.step[cell]]
+
+###############################################################################
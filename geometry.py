@@ -0,0 +1,129 @@
+# local
+from antmath import (displace_loc, loc_displacement, neighbors, eightsquare,
+                     reverse_dir, naive_dir, distance2, torus_delta, disc,
+                     allinradius, DISPLACEMENT)
+
+
+'''
+Per-map torus geometry for the ants bots.
+
+A Kernel is made once the map size is known (the "start" of a game) and
+holds the tables which depend on it: the wrapped location of every cell and
+per-cell neighbor tables. It offers the same functions as antmath, so code
+written against the module can be handed a Kernel instead; the size
+arguments of those functions are kept for that reason and ignored in favour
+of the Kernel's own size.
+
+A Cell is an integer index row * cols + col of a wrapped Loc. Cells are
+cheaper to make, hash and compare than tuples; the cell_* methods are the
+Cell counterparts of the Loc helpers.
+
+'''
+
+
+# direction --> index into a row of Kernel.neighbor_cells
+DIRINDEX = {'N': 0, 'E': 1, 'S': 2, 'W': 3}
+
+
+###############################################################################
+
+
+class Kernel(object):
+    '''Torus geometry tables for one map size.'''
+
+    displace_loc = staticmethod(displace_loc)
+    loc_displacement = staticmethod(loc_displacement)
+    neighbors = staticmethod(neighbors)
+    eightsquare = staticmethod(eightsquare)
+    reverse_dir = staticmethod(reverse_dir)
+    naive_dir = staticmethod(naive_dir)
+    distance2 = staticmethod(distance2)
+    torus_delta = staticmethod(torus_delta)
+    disc = staticmethod(disc)
+    allinradius = staticmethod(allinradius)
+
+    def __init__(self, size):
+        self.size = size
+        self.rows, self.cols = h, w = size
+        # Cell --> Loc
+        self.locs = [(r, c) for r in xrange(h) for c in xrange(w)]
+        self.discs2 = {}                # squared radius --> list<(dr, dc)>
+        # Cell --> tuple of the NESW neighbor Cells
+        self.neighbor_cells = [
+            ((r - 1) % h * w + c, r * w + (c + 1) % w,
+             (r + 1) % h * w + c, r * w + (c - 1) % w)
+            for r, c in self.locs]
+
+    def cell(self, loc):
+        '''Return the Cell of a Loc, wrapping it first.'''
+        return loc[0] % self.rows * self.cols + loc[1] % self.cols
+
+    def cellat(self, row, col):
+        '''Return the Cell of an on-map row and column.'''
+        return row * self.cols + col
+
+    def cell_step(self, cell, direction):
+        '''Cell after displacing in the given direction.'''
+        if direction == '=':
+            return cell
+        return self.neighbor_cells[cell][DIRINDEX[direction]]
+
+    def cell_neighbors(self, cell):
+        '''Return the NESW neighbor Cells of a Cell.'''
+        return self.neighbor_cells[cell]
+
+    def cell_distance2(self, a, b):
+        '''Euclidean distance squared between two Cells on the torus.'''
+        dr = torus_delta(a // self.cols - b // self.cols, self.rows)
+        dc = torus_delta(a % self.cols - b % self.cols, self.cols)
+        return dr * dr + dc * dc
+
+    def wrap_loc(self, loc, size=None):
+        '''Finds the true on-map coordinates of an unwrapped location.'''
+        return loc[0] % self.rows, loc[1] % self.cols
+
+    wrap = wrap_loc
+
+    def delta(self, origin, target):
+        '''Return the shortest (row, column) displacement from origin to
+        target on the torus.'''
+        return (torus_delta(target[0] - origin[0], self.rows),
+                torus_delta(target[1] - origin[1], self.cols))
+
+    def unwrap(self, origin, target):
+        '''Return the image of target nearest to origin.'''
+        dr = torus_delta(target[0] - origin[0], self.rows)
+        dc = torus_delta(target[1] - origin[1], self.cols)
+        return origin[0] + dr, origin[1] + dc
+
+    def nearest_unwrapped_loc(self, origin, size, target):
+        '''Find the nearest unwrapped image of the target location to the
+        origin. Return the squared distance and the location as a tuple.'''
+        dr = torus_delta(target[0] - origin[0], self.rows)
+        dc = torus_delta(target[1] - origin[1], self.cols)
+        return dr * dr + dc * dc, (origin[0] + dr, origin[1] + dc)
+
+    def step(self, loc, direction):
+        '''Wrapped location after displacing in the given direction.'''
+        dr, dc = DISPLACEMENT[direction]
+        return (loc[0] + dr) % self.rows, (loc[1] + dc) % self.cols
+
+    def offsets(self, rad2):
+        '''Return the cached list of (row delta, column delta) within a
+        squared radius.'''
+        try:
+            return self.discs2[rad2]
+        except KeyError:
+            rad = int(rad2 ** 0.5)
+            offsets = self.discs2[rad2] = [
+                (dr, dc) for dr in xrange(-rad, rad + 1)
+                for dc in xrange(-rad, rad + 1) if dr * dr + dc * dc <= rad2]
+            return offsets
+
+    def wrapped_neighbors(self, loc):
+        '''Return the wrapped NESW neighbors of a wrapped Loc.'''
+        locs = self.locs
+        return [locs[n] for n in
+                self.neighbor_cells[loc[0] * self.cols + loc[1]]]
+
+###############################################################################
@@ -0,0 +1,121 @@
+# stdlib
+import collections
+
+
+'''
+Compact per-layer grid storage for the ants protocol.
+
+Each Layer keeps one byte per map cell, indexed by row * cols + col, along
+with the list of locations that are currently set. Deciders are handed a
+LayerView, a read-only dict-compatible adapter over the same storage, so no
+copying is needed between the protocol and the decider.
+
+A Loc is a tuple of two integers representing a row & column pair.
+A Size is a tuple of two integers representing a height & width pair.
+
+'''
+
+
+###############################################################################
+
+
+class Layer(object):
+    '''Per-cell storage for one type of game object.
+
+    Flag layers (water, food) answer True for every set cell. Other layers
+    (hills, ants) store a small positive integer per cell, such as the owner.
+
+    '''
+
+    def __init__(self, size, flag=False):
+        self.rows, self.cols = size
+        self.flag = flag
+        self.cells = bytearray(self.rows * self.cols) # cell --> value or 0
+        self.locs = []                                # Locs in order set
+        self.view = LayerView(self)
+
+    def index(self, loc):
+        '''Return the cell index of an on-map Loc or None.'''
+        r, c = loc
+        if 0 <= r < self.rows and 0 <= c < self.cols:
+            return r * self.cols + c
+        return None
+
+    def __setitem__(self, loc, value):
+        i = self.index(loc)
+        if i is None:
+            raise KeyError(loc)
+        if not self.cells[i]:
+            self.locs.append(loc)
+        self.cells[i] = 1 if self.flag else value
+
+    def __getitem__(self, loc):
+        i = self.index(loc)
+        if i is None or not self.cells[i]:
+            raise KeyError(loc)
+        return True if self.flag else self.cells[i]
+
+    def __contains__(self, loc):
+        i = self.index(loc)
+        return i is not None and self.cells[i] != 0
+
+    def __iter__(self):
+        return iter(self.locs)
+
+    def __len__(self):
+        return len(self.locs)
+
+    def clear(self):
+        '''Unset every set cell; costs as much as there are set cells.'''
+        cols, cells = self.cols, self.cells
+        for r, c in self.locs:
+            cells[r * cols + c] = 0
+        del self.locs[:]
+
+    def copy(self):
+        '''Return a plain dict holding the same Locs and values.'''
+        return dict(self.view.iteritems())
+
+
+class LayerView(collections.Mapping):
+    '''Read-only dict-compatible view of a Layer.
+
+    Reflects the Layer's current contents; nothing is copied.
+
+    '''
+
+    def __init__(self, layer):
+        self.__layer = layer
+
+    def __getitem__(self, loc):
+        return self.__layer[loc]
+
+    def __contains__(self, loc):
+        return loc in self.__layer
+
+    def __iter__(self):
+        return iter(self.__layer.locs)
+
+    def __len__(self):
+        return len(self.__layer.locs)
+
+    def iterkeys(self):
+        return iter(self.__layer.locs)
+
+    def viewkeys(self):
+        return collections.KeysView(self)
+
+    def copy(self):
+        '''Return a plain dict snapshot, like dict.copy().'''
+        return self.__layer.copy()
+
+    @property
+    def cells(self):
+        '''Read-only buffer of the per-cell bytes (0 means unset).'''
+        return buffer(self.__layer.cells)
+
+    @property
+    def size(self):
+        return self.__layer.rows, self.__layer.cols
+
+###############################################################################
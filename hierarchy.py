@@ -0,0 +1,290 @@
+# stdlib
+import heapq
+import collections
+# local
+import pathing
+
+
+'''
+Hierarchical pathfinding on the torus for the ants bots.
+
+The map is cut into square sectors. Where a sector border has a run of open
+cells on both sides, portals are placed across it: one pair in the middle of
+a short run, a pair at each end of a long one. Portals of the same sector are
+joined by their distances inside it, which makes a small graph standing in
+for the map.
+
+A long trip is a search over that graph from the goal, giving every portal's
+distance to it, plus a search inside the start sector for the best portal to
+head for. Short trips are searched directly with pathing.Paths.
+
+The step toward a waypoint follows distances inside the sector, so every
+step of a long trip shortens the estimate and an ant cannot be drawn back and
+forth between waypoints.
+
+Only the sectors in which water is discovered, and their neighbors, have
+their portals and distances rebuilt, on the next request.
+
+Cells are geometry.Kernel Cells.
+
+'''
+
+
+WIDE = 6 # runs of open border cells this long get a portal at each end
+
+
+###############################################################################
+
+
+class Hierarchy(object):
+    '''Sector and portal graph over a water bitmap for long routes.'''
+
+    def __init__(self, kernel, water=None, side=10, near=None, capacity=64):
+        self.kernel = kernel
+        if water is None:
+            water = bytearray(kernel.rows * kernel.cols)
+        self.water = water          # bytearray; nonzero cells are impassable
+        self.side = side            # side of a sector
+        self.near = 2 * side if near is None else near # searched directly
+        self.capacity = capacity    # goal trees kept
+        self.local = pathing.Paths(kernel, water)
+        h, w = kernel.rows, kernel.cols
+        self.srows, self.scols = -(-h // side), -(-w // side)
+        # Cell --> sector
+        self.sectorof = [r // side * self.scols + c // side
+                         for r, c in kernel.locs]
+        self.borders = {}           # sector, 'S' or 'E' --> list<(Cell, Cell)>
+        self.cross = {}             # portal Cell --> set<portal Cell> across
+        self.portals = {}           # sector --> list<portal Cell>
+        self.intra = {}             # sector --> {Cell: {Cell: steps}}
+        self.reach = {}             # portal Cell --> {Cell: steps} in sector
+        self.dirty = set(xrange(self.srows * self.scols)) # to rebuild
+        self.trees = collections.OrderedDict() # goal --> {Cell: steps}, next
+
+    #
+    # sectors
+
+    def neighbor(self, sector, direction):
+        '''Return the sector next to a sector in a NESW direction.'''
+        sr, sc = divmod(sector, self.scols)
+        if direction == 'N':
+            sr = (sr - 1) % self.srows
+        elif direction == 'S':
+            sr = (sr + 1) % self.srows
+        elif direction == 'E':
+            sc = (sc + 1) % self.scols
+        else:
+            sc = (sc - 1) % self.scols
+        return sr * self.scols + sc
+
+    def span(self, sector, direction):
+        '''Return the (inside, outside) Cell pairs across a sector's S or E
+        border.'''
+        h, w, k = self.kernel.rows, self.kernel.cols, self.side
+        sr, sc = divmod(sector, self.scols)
+        r0, c0 = sr * k, sc * k
+        r1, c1 = min(r0 + k, h), min(c0 + k, w)
+        if direction == 'S':
+            return [((r1 - 1) * w + c, r1 % h * w + c) for c in xrange(c0, c1)]
+        return [(r * w + c1 - 1, r * w + c1 % w) for r in xrange(r0, r1)]
+
+    def within(self, cell):
+        '''Return the steps from a Cell to each Cell reachable without
+        leaving its sector.'''
+        sectorof, water = self.sectorof, self.water
+        neighbor_cells = self.kernel.neighbor_cells
+        sector = sectorof[cell]
+        dist = {cell: 0}
+        frontier = [cell]
+        d = 0
+        while frontier:
+            d += 1
+            reached = []
+            for c in frontier:
+                for n in neighbor_cells[c]:
+                    if n not in dist and sectorof[n] == sector and \
+                       not water[n]:
+                        dist[n] = d
+                        reached.append(n)
+            frontier = reached
+        return dist
+
+    #
+    # graph
+
+    def link(self, border):
+        '''Place the portals across a border.'''
+        cross, water = self.cross, self.water
+        for a, b in self.borders.get(border, ()):
+            for x, y in ((a, b), (b, a)):
+                keys = cross.get(x)
+                if keys:
+                    keys.discard(y)
+                    if not keys:
+                        del cross[x]
+        pairs = []
+        run = []
+        for a, b in self.span(*border) + [(None, None)]:
+            if a is not None and not water[a] and not water[b]:
+                run.append((a, b))
+                continue
+            if len(run) >= WIDE:
+                pairs.extend((run[0], run[-1]))
+            elif run:
+                pairs.append(run[len(run) // 2])
+            run = []
+        self.borders[border] = pairs
+        for a, b in pairs:
+            cross.setdefault(a, set()).add(b)
+            cross.setdefault(b, set()).add(a)
+
+    def connect(self, sector):
+        '''Find a sector's portals and the distances between them.'''
+        sectorof = self.sectorof
+        n, w = self.neighbor(sector, 'N'), self.neighbor(sector, 'W')
+        portals = set()
+        for border in ((sector, 'S'), (sector, 'E'), (n, 'S'), (w, 'E')):
+            for pair in self.borders.get(border, ()):
+                portals.update(p for p in pair if sectorof[p] == sector)
+        for p in self.portals.get(sector, ()):
+            del self.reach[p]
+        self.portals[sector] = portals = list(portals)
+        steps = self.intra[sector] = {}
+        for p in portals:
+            reach = self.reach[p] = self.within(p)
+            steps[p] = {q: reach[q] for q in portals if q != p and q in reach}
+
+    def rebuild(self):
+        '''Bring the sectors with new water, and their neighbors, up to
+        date.'''
+        if not self.dirty:
+            return
+        touched = set()
+        for sector in self.dirty:
+            n, w = self.neighbor(sector, 'N'), self.neighbor(sector, 'W')
+            for border in ((sector, 'S'), (sector, 'E'), (n, 'S'), (w, 'E')):
+                self.link(border)
+            touched.update((sector, n, w, self.neighbor(sector, 'S'),
+                            self.neighbor(sector, 'E')))
+        for sector in touched:
+            self.connect(sector)
+        self.dirty.clear()
+        self.trees.clear()
+
+    def tree(self, goal):
+        '''Return every portal's steps to a goal Cell over the graph, the
+        next Cell toward it and the steps to the goal inside its sector,
+        computed once per goal.'''
+        try:
+            tree = self.trees.pop(goal)
+        except KeyError:
+            tree = self.search(goal)
+            if len(self.trees) >= self.capacity:
+                self.trees.popitem(last=False) # least recently used
+        self.trees[goal] = tree
+        return tree
+
+    def search(self, goal):
+        '''Dijkstra's search of the portal graph outward from a goal Cell.'''
+        reach = self.within(goal)
+        dist, nxt = {}, {}
+        frontier = []
+        for p in self.portals.get(self.sectorof[goal], ()):
+            if p in reach:
+                dist[p], nxt[p] = reach[p], goal
+                frontier.append((reach[p], p))
+        heapq.heapify(frontier)
+        intra, cross, sectorof = self.intra, self.cross, self.sectorof
+        while frontier:
+            d, p = heapq.heappop(frontier)
+            if d > dist[p]:
+                continue
+            edges = intra[sectorof[p]][p].items()
+            edges.extend((q, 1) for q in cross.get(p, ()))
+            for q, steps in edges:
+                if d + steps < dist.get(q, d + steps + 1):
+                    dist[q], nxt[q] = d + steps, p
+                    heapq.heappush(frontier, (d + steps, q))
+        return dist, nxt, reach
+
+    #
+    # api
+
+    def waypoint(self, start, goal):
+        '''Return (steps, Cell, {Cell: steps}) for the first waypoint on the
+        way between two Cells: the estimated length of the trip, the
+        waypoint and the steps to it inside its sector. Return None if the
+        graph knows no way.'''
+        self.rebuild()
+        dist, nxt, goalreach = self.tree(goal)
+        reach = self.within(start)
+        best = (reach[goal], goal) if goal in reach else None
+        for p in self.portals.get(self.sectorof[start], ()):
+            if p in reach and p in dist:
+                d = reach[p] + dist[p]
+                if best is None or d < best[0]:
+                    best = d, p
+        if best is None:
+            return None
+        steps, cell = best
+        if cell == start and cell != goal:
+            cell = nxt[cell]
+        return steps, cell, goalreach if cell == goal else self.reach.get(cell)
+
+    def waypoints(self, start, goal):
+        '''Return the list of Cells from one Loc to another over the graph,
+        both included, or None.'''
+        cell = self.kernel.cell
+        start, goal = cell(start), cell(goal)
+        first = self.waypoint(start, goal)
+        if first is None:
+            return None
+        route = [start]
+        _, cell, _ = first
+        nxt = self.trees[goal][1]
+        while cell != route[-1]:
+            route.append(cell)
+            if cell == goal:
+                break
+            cell = nxt[cell]
+        return route
+
+    def isnear(self, start, goal):
+        dr, dc = self.kernel.delta(start, goal)
+        return abs(dr) + abs(dc) <= self.near
+
+    def direction(self, start, goal):
+        '''First NESW step from one Loc toward another.
+
+        Return '=' when already there and None when there is no known way.
+
+        '''
+        if self.isnear(start, goal):
+            return self.local.direction(start, goal)
+        start = self.kernel.cell(start)
+        first = self.waypoint(start, self.kernel.cell(goal))
+        if first is None:
+            return None
+        _, cell, reach = first
+        around = self.kernel.neighbor_cells[start]
+        if cell in around:
+            return pathing.DIRECTIONS[around.index(cell)]
+        for v, n in zip(pathing.DIRECTIONS, around):
+            if reach.get(n) == reach[start] - 1:
+                return v
+        return None
+
+    def distance(self, start, goal):
+        '''Steps between two Locs, estimated for long trips, or None.'''
+        if self.isnear(start, goal):
+            return self.local.distance(start, goal)
+        first = self.waypoint(self.kernel.cell(start), self.kernel.cell(goal))
+        return None if first is None else first[0]
+
+    def discover(self, newwater):
+        '''Add newly seen water (Locs) and mark its sectors for rebuilding.'''
+        self.local.discover(newwater)
+        cell, sectorof = self.kernel.cell, self.sectorof
+        self.dirty.update(sectorof[cell(loc)] for loc in newwater)
+
+###############################################################################
@@ -0,0 +1,48 @@
+# stdlib
+from array import array
+
+
+'''
+Influence maps on the torus for the ants bots.
+
+An Influence counts, for every cell of the map, how many objects of a layer
+lie within a squared radius of it. It is the layer convolved with the disc of
+that radius, computed by stamping the disc's stencil once per object, so an
+ant's threat (enemies within attack range) or support (friends within
+attack range) is a single array lookup afterward.
+
+Cells are geometry.Kernel Cells.
+
+'''
+
+
+###############################################################################
+
+
+class Influence(object):
+    '''Per-cell count of objects within a squared radius.'''
+
+    def __init__(self, kernel, cells, rad2):
+        self.kernel = kernel
+        self.rad2 = rad2
+        h, w = kernel.rows, kernel.cols
+        self.counts = counts = array('l', [0]) * (h * w)
+        offsets = kernel.offsets(rad2)
+        deltas = [dr * w + dc for dr, dc in offsets]
+        rad = int(rad2 ** 0.5)
+        rows, cols = xrange(rad, h - rad), xrange(rad, w - rad)
+        locs = kernel.locs
+        for cell in cells:
+            r, c = locs[cell]
+            if r in rows and c in cols:
+                for d in deltas:
+                    counts[cell + d] += 1
+            else:
+                for dr, dc in offsets:
+                    counts[(r + dr) % h * w + (c + dc) % w] += 1
+
+    def at(self, loc):
+        '''Number of objects within the radius of a Loc.'''
+        return self.counts[self.kernel.cell(loc)]
+
+###############################################################################
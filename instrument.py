@@ -0,0 +1,86 @@
+# stdlib
+from array import array
+# local
+from budget import clock
+
+
+'''
+Per-phase timing instrumentation for the ants protocol and deciders.
+
+Work is timed as spans on the monotonic clock and collected by name for the
+whole game; the summary (count, p50, p95, max, total) is produced once, at
+game end. Counters tally events such as cache hits by name.
+
+Typical use chains phases off one clock reading:
+
+    t = spans.clock()
+    ...parse...
+    t = spans.mark('parse', t)
+    ...think...
+    t = spans.mark('decider', t)
+
+A disabled Spans records nothing.
+
+'''
+
+
+###############################################################################
+
+
+class Spans(object):
+    '''Named timing spans (milliseconds) and counters for one game.'''
+
+    def __init__(self, path=None, enabled=True):
+        self.path = path        # where write() puts the report
+        self.enabled = enabled
+        self.spans = {}         # name --> array<float> (milliseconds)
+        self.counts = {}        # name --> int
+        self.clock = clock
+
+    def add(self, name, ms):
+        '''Record a span that took ms milliseconds.'''
+        if self.enabled:
+            try:
+                self.spans[name].append(ms)
+            except KeyError:
+                self.spans[name] = array('d', [ms])
+
+    def mark(self, name, start):
+        '''Record a span from start (a clock() reading) until now.
+
+        Return the clock reading for now.
+
+        '''
+        now = clock()
+        if self.enabled:
+            self.add(name, (now - start) * 1000.0)
+        return now
+
+    def count(self, name, n=1):
+        '''Add n to a counter.'''
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def report(self):
+        '''Return a table summarizing every span and counter.'''
+        lines = ['{:<24} {:>6} {:>10} {:>10} {:>10} {:>12}'.format(
+            'span', 'count', 'p50ms', 'p95ms', 'maxms', 'totalms')]
+        for name in sorted(self.spans):
+            values = sorted(self.spans[name])
+            n = len(values)
+            lines.append('{:<24} {:>6} {:>10.3f} {:>10.3f} {:>10.3f} {:>12.3f}'.
+                         format(name, n, values[n // 2],
+                                values[min(int(0.95 * n), n - 1)],
+                                values[-1], sum(values)))
+        for name in sorted(self.counts):
+            lines.append('{:<24} {:>6}'.format(name, self.counts[name]))
+        return '\n'.join(lines)
+
+    def write(self):
+        '''Write the report to the path, if there is one.'''
+        if self.enabled and self.path:
+            with open(self.path, 'w') as f:
+                f.write(self.report())
+                f.write('\n')
+
+###############################################################################
@@ -0,0 +1,123 @@
+# stdlib
+import time
+import datetime
+import collections
+
+
+'''
+Buffered logging for the ants bots.
+
+Records are queued with their arguments and a timestamp; nothing is
+formatted or written until the queue is drained, which MyBot does after
+sending each turn's orders. Records below the logger's level, or in a
+category that is switched off, are discarded up front. The queue is bounded:
+when it is full, new records are counted and dropped rather than slowing the
+turn down.
+
+A Logger is also callable like the old log functions:
+
+    log('some text')
+    log('some text', noprefix=True)     # no timestamp
+
+'''
+
+
+DEBUG, INFO, WARN = 10, 20, 30
+
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warn': WARN}
+
+
+###############################################################################
+
+
+class Logger(object):
+    '''Leveled, categorized logger with a bounded queue.'''
+
+    def __init__(self, out, level=DEBUG, off=(), capacity=1 << 16):
+        self.out = out              # file-like object
+        self.level = level
+        self.off = set(off)         # categories switched off
+        self.capacity = capacity
+        self.queue = collections.deque()
+        self.dropped = 0
+
+    def enabled(self, level, category=None):
+        '''Would a record at this level and category be kept?'''
+        return level >= self.level and category not in self.off
+
+    def log(self, level, category, fmt, *args, **kwargs):
+        '''Queue a record; fmt.format(*args) happens when it is written.'''
+        if level < self.level or category in self.off:
+            return
+        if len(self.queue) >= self.capacity:
+            self.dropped += 1
+            return
+        self.queue.append((time.time(), kwargs.get('noprefix', False),
+                           fmt, args))
+
+    def debug(self, category, fmt, *args):
+        self.log(DEBUG, category, fmt, *args)
+
+    def info(self, category, fmt, *args):
+        self.log(INFO, category, fmt, *args)
+
+    def warn(self, category, fmt, *args):
+        self.log(WARN, category, fmt, *args)
+
+    def __call__(self, s, noprefix=False):
+        self.log(INFO, None, s, noprefix=noprefix)
+
+    def drain(self):
+        '''Format and write every queued record.'''
+        queue, write = self.queue, self.out.write
+        while queue:
+            stamp, noprefix, fmt, args = queue.popleft()
+            s = fmt.format(*args) if args else fmt
+            if noprefix:
+                write('{}\n'.format(s))
+            else:
+                write('{} {}\n'.format(
+                    datetime.datetime.fromtimestamp(stamp), s))
+        if self.dropped:
+            write('{} dropped {} log records\n'.format(
+                datetime.datetime.now(), self.dropped))
+            self.dropped = 0
+        self.out.flush()
+
+
+class Immediate(object):
+    '''Logger interface over a plain log function; formats right away.'''
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def enabled(self, level, category=None):
+        return True
+
+    def log(self, level, category, fmt, *args, **kwargs):
+        self.fn(fmt.format(*args) if args else fmt,
+                noprefix=kwargs.get('noprefix', False))
+
+    def debug(self, category, fmt, *args):
+        self.log(DEBUG, category, fmt, *args)
+
+    def info(self, category, fmt, *args):
+        self.log(INFO, category, fmt, *args)
+
+    def warn(self, category, fmt, *args):
+        self.log(WARN, category, fmt, *args)
+
+    def __call__(self, s, noprefix=False):
+        self.fn(s, noprefix=noprefix)
+
+    def drain(self):
+        pass
+
+
+def leveled(logfn):
+    '''Return a Logger-like object for logfn (None stays None).'''
+    if logfn is None or isinstance(logfn, (Logger, Immediate)):
+        return logfn
+    return Immediate(logfn)
+
+###############################################################################
@@ -1,11 +1,15 @@
 # stdlib
-from math import fsum
+from array import array
 import itertools as it
-import random
 # local
 from hedge import Hedge
+import budget
+import instrument
 import antmath
 import environment
+import pool
+import sampler
+import triage
 #
 import betterexplore
 import brownian
@@ -39,20 +43,33 @@ algorithm.
 class Decider(object):
     '''Decider object as required by protocol.py.'''
 
-    def __init__(self, logfn=None):
+    def __init__(self, logfn=None, workers=0):
         self.log = logfn
         self.__think = None
         self.env = None
+        self.workers = workers  # expert processes; 0 runs experts serially
+        self.pool = None
 
     def start(self, game):
         '''Set up the decider according to the game specifications.'''
+        self.env = environment.LazyEnvDigest(
+            (game['rows'], game['cols']), game['viewradius'], self.log,
+            game.get('geometry'), game.get('spans'))
+        if self.workers:
+            self.pool = pool.Pool(EXPERTS, game, self.workers)
+            self.env.subscribe(self.pool.learn)
+            game = dict(game, pool=self.pool)
         self.__think = meta(self.log, game)
         self.__think.next()
-        self.env = environment.LazyEnvDigest(
-            (game['rows'], game['cols']), game['viewradius'], self.log)
+
+    def discover(self, newwater):
+        '''Take the water first seen this turn.'''
+        self.env.discover(newwater)
 
     def think(self, *args):
         '''Return a dict with the keys of myant mapped to lists of NESW=.'''
+        if self.pool:
+            self.pool.take(args)
         self.env.update_env(*args)
         return self.__think.send(self.env)
 
@@ -79,9 +96,11 @@ EXPERTS = (
 
 def meta(logfn, game):
     vectors = list('NESW=')
+    codes = {v: k for k, v in enumerate(vectors)} # vector --> column
 
-    # experts (generators)
+    # experts (generators), unless a pool of worker processes runs them
     experts = [e.genmoves(logfn, game) for e in EXPERTS]
+    workers = game.get('pool')
     enames = [e.__name__ for e in EXPERTS]
     logfn and logfn('# ' + ' '.join(n[n.find('.') + 1:] for n in \
                                     enames + ['ant-count']),
@@ -94,6 +113,16 @@ def meta(logfn, game):
     hedge = Hedge(0.25, len(experts))
     faith = hedge.next()
 
+    # turn budget, split among the experts
+    turnbudget = game.get('budget') or budget.Budget()
+
+    # load shedding: which ants the experts take, most urgent first
+    ranking = triage.Triage(game)
+
+    # timing instrumentation
+    spans = game.get('spans') or instrument.Spans(enabled=False)
+    spannames = ['expert ' + n[n.find('.') + 1:] for n in enames]
+
     # loop
     env = environment.LazyEnvDigest((0, 0), 0, None) # for warmup
     while True:
@@ -107,8 +136,26 @@ def meta(logfn, game):
         #            {1:'N', 2:'S', 4:'S', 5:'W'}]
 
         if len(env.myant) >= 250:
-            env.food.clear()
-        moves = [e.send(env) for e in experts]
+            env.forget('food')
+        t = began = spans.clock() # triage counts against its own budget
+        shed = ranking.select(env, turnbudget)
+        t = spans.mark('triage', t)
+        results = workers and workers.send(env, turnbudget)
+        if results:
+            moves, ms = results
+            for name, span in it.izip(spannames, ms):
+                spans.add(name, span)
+            t = spans.clock()
+        else:
+            # serially, and from now on if the pool has failed
+            workers = None
+            moves = []
+            t = spans.clock()
+            for i, e in enumerate(experts):
+                env.budget = turnbudget.share(len(experts) - i)
+                moves.append(e.send(env))
+                t = spans.mark(spannames[i], t)
+        ranking.measure(len(env.myid), (t - began) * 1000.0)
 
         # make sure ants have orders from at least one strategy
         #assert all(env.myid - m.viewkeys() == set() for m in moves)
@@ -116,48 +163,52 @@ def meta(logfn, game):
         # combine the move recommendations into distributions
         # eg:
         #   faith = [0.8, 0.2]
-        # result:
-        #   lincomb = {1: ({'N':1.0, 'E':0.0, 'S':0.0, 'W':0.0, '=':0.0}, {}),
-        #              2: ({'N':0.0, 'E':0.8, 'S':0.2, 'W':0.0, '=':0.0}, {}),
-        #              4: ({'N':0.0, 'E':0.0, 'S':0.2, 'W':0.0, '=':0.0}, {}),
-        #              5: ({'N':0.0, 'E':0.0, 'S':0.0, 'W':0.8, '=':0.2}, {})}
+        #   moves = [{1:'N', 2:'E',        5:'='},
+        #            {1:'N', 2:'S', 4:'S', 5:'W'}]
         #
-        # actually, each probability is really a 2-tuple in which the second
-        # part is a list of the strategy indexes that output that vector
-        # eg:
-        #   lincomb = {1: {'N':(1.0, [0, 1]), ...
+        # the recommendations become an ants x experts matrix of vector codes
+        # (columns of NESW=, -1 for none), and each expert's faith is added
+        # into an ants x 5 matrix of probabilities at its codes
+        # result (rows for ants 1, 2, 4 and 5):
+        #   recommended = [ 0,  0,      probs = [1.0, 0.0, 0.0, 0.0, 0.0,
+        #                   1,  2,               0.0, 0.8, 0.2, 0.0, 0.0,
+        #                  -1,  2,               0.0, 0.0, 0.2, 0.0, 0.0,
+        #                   4,  3]               0.0, 0.0, 0.0, 0.2, 0.8]
         #
         # this way we blame strategy 0 and strategy 1 when moving ant 1 north
-        # causes it to die
+        # causes it to die: the blamed experts are those in the ant's row of
+        # recommended having the code of the move it made
         #
-        # you'll notice in the example that ant 4's entry doesn't sum to one
+        # you'll notice in the example that ant 4's row doesn't sum to one
         # because strategy 0 didn't recommend anything for it -- this is
-        # compensated for in 'distpick'
-
-        lincomb = {aI: {vect: (fsum(f for f, m in it.izip(faith, moves) \
-                                    if aI in m and m[aI] == vect),
-                               [i for i, m in enumerate(moves) \
-                                if aI in m and m[aI] == vect]
-                               ) \
-                        for vect in vectors} \
-                   for aI in env.myid}
-
-        # make a probabalistic generator for each ant's decision-vector
+        # compensated for in the sampler, which only compares them
+
+        count = len(experts)
+        rows = {aI: r for r, aI in enumerate(env.myid)} # id --> row
+        recommended = array('b', [-1]) * (len(rows) * count)
+        probs = array('d', [0.0]) * (len(rows) * 5)
+        for i, (f, m) in enumerate(it.izip(faith, moves)):
+            for aI, vect in m.iteritems():
+                try:
+                    r, k = rows[aI], codes[vect]
+                except (KeyError, TypeError):
+                    continue # not my ant or not one vector (eg. a list)
+                recommended[r * count + i] = k
+                probs[r * 5 + k] += f
+        t = spans.mark('lincomb', t)
+
+        # draw a random preference order of each ant's decision-vectors
+        # the ants set aside keep their last order
         # get a new environment
 
+        orders = sampler.orderings(probs, vectors)
+        ranking.remember({aI: orders[r] for aI, r in rows.iteritems()})
+        decided = {env.myid[aI][0]: orders[r] for aI, r in rows.iteritems()}
+        decided.update(ranking.defaults(shed))
+        spans.mark('sample', t)
         oldfood = env.food.copy()
-        env = yield {env.myid[aI][0]: distpicker(vd) \
-                     for aI, vd in lincomb.iteritems()}
-
-        # last minute hack: don't process more than 100 ants each turn
-        # unfortunately, this bot is not efficient, and frequently times-out
-        # without this hack
-
-        keys = env.myant.keys()
-        while len(env.myant) > 100:
-            k = random.choice(keys)
-            keys.remove(k)
-            env.myant.pop(k)
+        env = yield decided
+        t = spans.clock()
 
         # assign loss to strategies according to how the ants fared
 
@@ -169,63 +220,31 @@ def meta(logfn, game):
         #                 Fa> MINOR LOSS (0, 1)
         #           Fa> MAJOR LOSS (1)
 
-        loss = [[] for e in experts]
+        loss = array('d', [0.0]) * count
 
-        for aI, vd in lincomb.iteritems():
+        for aI, r in rows.iteritems():
             alive = aI in env.myid
             try:
                 aN, aO = env.myid[aI] if alive else env.mydeadid[aI]
             except KeyError:
                 continue
-            move = antmath.loc_displacement(aO, env.unwrap(aO, aN))
-            prob, blame = vd[move] if move in vd else (None, None)
-            if prob:
+            k = codes[antmath.loc_displacement(aO, env.unwrap(aO, aN))]
+            if probs[r * 5 + k]:
                 # determine loss for this ant
                 als = (0.0 if tookfood(oldfood, env, aN) else 0.1) \
                       if alive else 1.0
-                for i in blame:
-                    loss[i].append(als)
+                # sum it by strategy over the blame mask
+                row = recommended[r * count:(r + 1) * count]
+                for i, code in enumerate(row):
+                    if code == k:
+                        loss[i] += als
 
-        # sum loss by strategy and apply to hedge
+        # apply the loss to hedge
 
-        faith = hedge.send([fsum(l) / len(lincomb) if lincomb else 0.0 \
-                            for l in loss])
+        faith = hedge.send([l / len(rows) if rows else 0.0 for l in loss])
+        spans.mark('hedge', t)
 
 
 def tookfood(oldfood, env, aloc):
     '''Did any locations neighboring the ant contain food last turn?'''
     return any(loc in oldfood for loc in env.wrapiter(env.tonari(aloc)))
-
-
-def distpicker(dist):
-    '''Generate keys from dist according to their probabilities.
-    dist is a [vect --> (prob, blame)]
-
-    Stop after yielding all keys with probablitity greater than zero.
-
-    '''
-    def distpick(d):
-        '''Return a key from d according to its probability.
-        d is a [vect --> prob]
-        return a 2-tuple (vect, prob)
-        '''
-        # produce cdf
-        _, cdf = reduce(lambda (pdf, cdf), (vect, prob): \
-                        (pdf + [prob], cdf + [(vect, fsum(pdf + [prob]))]),
-                        dist.iteritems(),
-                        ([], []))
-        # produce a scaled random picker
-        pick = cdf[-1][1] * random.random()
-        # return vect of first prob in cdf which is greater than picker
-        return reduce(lambda acc, (vect, cprob): \
-                      (vect, cprob) if cprob > pick and not acc else acc,
-                      cdf,
-                      False)
-    ### INNER ###
-    # strip blame; filter zero probabilities
-    dist = {v: p for v, (p, _) in dist.iteritems() if p}
-    assert round(fsum(dist.viewvalues()), 6) <= 1.0 # sum to at most 1.000000
-    while dist:
-        vect, prob = distpick(dist)
-        yield vect
-        dist.pop(vect)
@@ -13,24 +13,26 @@ Complete strategy to move away from where we've been (and water).
 
 def genmoves(logfn, game):
     moves = {}
-    past = {}
+    rows = game['registry'].rows
+    past = game['registry'].column('betterexplore past') # row --> loc
     lr = 0.4
     pf = 0.7
     while True:
         env = yield moves
         moves = {}
 
-        for aI, (aN, aO) in env.myid.iteritems():
+        for aI, (aN, aO) in env.ants():
 
             # weighted average of all previous moves
-            if aI in past:
+            row = rows[aI]
+            if past[row] is not None:
                 aOr, aOc = aO
-                pr, pc = past[aI]
-                past[aI] = (aOr * lr + pr * (1.0 - lr),
-                            aOc * lr + pc * (1.0 - lr))
+                pr, pc = past[row]
+                past[row] = (aOr * lr + pr * (1.0 - lr),
+                             aOc * lr + pc * (1.0 - lr))
             else:
-                past[aI] = aO
-            pr, pc = past[aI]
+                past[row] = aO
+            pr, pc = past[row]
 
             # average of visible water
             water = env.digest('water', aN)
@@ -18,10 +18,11 @@ def genmoves(logfn, game):
         env = yield moves
         moves = {}
 
-        for aI, (aN, _) in env.myid.iteritems():
-            goals = env.digest('myant', aN)
-            if goals:
-                d2, gloc = goals[0]
+        buddies = env.perspectives('myant')
+        for aI, (aN, _) in env.ants():
+            goal = buddies.nearest(aN)
+            if goal:
+                d2, gloc = goal
                 if 2 ** 2 < d2 < 4 ** 2 and env.ray(aN, gloc):
                     moves[aI] = am.naive_dir(aN, gloc)
 
@@ -16,12 +16,15 @@ def genmoves(logfn, game):
         env = yield moves
         moves = {}
 
-        for aI, (aN, _) in env.myid.iteritems():
-            hill = env.digest('myhill', aN)
-            enemy = env.digest('enemyant', aN)
+        nearhill = env.influence('myhill', env.rad2)
+        for aI, (aN, _) in env.ants():
+            if not nearhill.at(aN):
+                continue
+            hill = env.nearest('myhill', aN)
+            enemy = env.nearest('enemyant', aN)
             if hill and enemy:
-                hill = hill[0][1]
-                enemy = enemy[0][1]
+                hill = hill[1]
+                enemy = enemy[1]
                 if env.ray(aN, enemy):
                     hr, hc = hill
                     er, ec = enemy
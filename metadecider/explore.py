@@ -17,7 +17,7 @@ def genmoves(logfn, game):
         env = yield moves
         moves = {}
 
-        for aI, (aN, aO) in env.myid.iteritems():
+        for aI, (aN, aO) in env.ants():
             ants = [gloc for d2, gloc in \
                     env.digest('myant', aN) + env.digest('enemyant', aN) \
                     if d2 > 2.5 ** 2] # don't consider your clump
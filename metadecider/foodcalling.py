@@ -18,6 +18,8 @@ def genmoves(logfn, game):
         moves = {}
 
         for f in env.food.iterkeys():
+            if not env.budget.checkin():
+                break
             ants = env.digest('myant', f)
 
             while ants:
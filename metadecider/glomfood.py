@@ -7,24 +7,34 @@ import antmath as am
 '''
 Simple strategy to gather food.
 
-Tells each ant to move toward its nearest reachable food.
+Tells each ant which has food in plain sight to take the first step of a
+shortest path around water to the nearest food, now and then another step
+which gets as close.
 
 '''
 
+
 def genmoves(logfn, game):
     moves = {}
     while True:
         env = yield moves
         moves = {}
 
-        for aI, (aN, _) in env.myid.iteritems():
-            food = env.digest('food', aN)
-
-            while food:
-                d2, f = food.pop(0)
-                if env.ray(aN, f):
-                    v1, v2 = am.naive_dir(aN, f)
-                    moves[aI] = v1 if random() < 0.75 else v2
-                    break
+        seen = env.perspectives('food')
+        paths = None
+        for aI, (aN, _) in env.ants():
+            if not seen.count(aN):
+                continue
+            if not any(env.ray(aN, f) for d2, f in env.digest('food', aN)):
+                continue
+            paths = paths or env.field('food', int(2 * env.rad))
+            v = paths.direction(aN)
+            if v and v != '=':
+                if random() >= 0.75:
+                    closer = paths.distance(aN) - 1
+                    others = [u for u in 'NESW' if u != v and
+                              paths.distance(am.displace_loc(u, aN)) == closer]
+                    v = choice(others) if others else v
+                moves[aI] = v
 
         moves = env.supplement(moves)
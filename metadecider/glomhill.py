@@ -18,12 +18,16 @@ def genmoves(logfn, game):
         env = yield moves
         moves = {}
 
-        for aN, (aI, _) in env.myant.iteritems():
+        paths = None
+        for aI, (aN, _) in env.ants():
             goals = env.digest('enemyhill', aN)
             if goals:
                 d2, gloc = goals[0]
                 around = env.wrapiter(antmath.eightsquare(gloc) + [gloc])
-                if not env.enemyant.viewkeys() & around and env.ray(aN, gloc):
-                    moves[aI] = env.ray(aN, gloc)
+                if not env.enemyant.viewkeys() & around:
+                    paths = paths or env.field('enemyhill', int(2 * env.rad))
+                    v = paths.direction(aN)
+                    if v and v != '=':
+                        moves[aI] = v
 
         moves = env.supplement(moves)
@@ -20,10 +20,13 @@ def genmoves(logfn, game):
         env = yield moves
         moves = {}
 
-        for aI, (aN, _) in env.myid.iteritems():
-            goals = env.digest('enemyant', aN)
-            if goals:
-                d2, target = goals[0]
+        threat = env.influence('enemyant', moveback)
+        for aI, (aN, _) in env.ants():
+            if not threat.at(aN):
+                continue
+            goal = env.nearest('enemyant', aN)
+            if goal:
+                d2, target = goal
                 if d2 <= moveback and env.ray(aN, target):
                         v1, v2 = am.naive_dir(target, aN)
                         # favor an indirect retreat to retain ground
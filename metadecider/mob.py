@@ -22,6 +22,8 @@ def genmoves(logfn, game):
         rec = {}
 
         for e in env.enemyant:
+            if not env.budget.checkin():
+                break
             mine = env.digest('myant', e)
             while mine:
                 d2, m = mine.pop()
@@ -1,6 +1,5 @@
 # stdlib
 import random
-import math
 # local
 import antmath
 
@@ -8,6 +7,9 @@ import antmath
 '''
 Complete strategy to drift toward food deposits..
 
+Ants with no food in sight head for the food nearest the middle of all known
+food, along env.paths.
+
 '''
 
 
@@ -17,12 +19,16 @@ def genmoves(logfn, game):
         env = yield moves
         moves = {}
 
-        for aI, (aN, aO) in env.myid.iteritems():
-            localfood = env.digest('food', aN)
-            if env.food and not localfood:
-                sumr = math.fsum(r for r, c in env.food)
-                sumc = math.fsum(c for r, c in env.food)
-                target = sumr / len(env.food), sumc / len(env.food)
-                moves[aI] = random.choice(antmath.naive_dir(aN, target))
+        target = env.centroid('food')
+        goal = None
+        for aI, (aN, aO) in env.ants():
+            if target and not env.count('food', aN):
+                goal = goal or min(env.food,
+                                   key=lambda f: env.dist2(f, target))
+                v = env.paths.direction(aN, goal)
+                if v in ('N', 'E', 'S', 'W'):
+                    moves[aI] = v
+                else:
+                    moves[aI] = random.choice(antmath.naive_dir(aN, target))
 
         moves = env.supplement(moves)
@@ -1,35 +1,53 @@
-# stdlib
-from random import random, choice
 # local
-import antmath as am
+import battle
 
 '''
 Simple strategy to close in on outnumbered enemies.
 
+Each fight is scored with battle.Battle; the ants in it are told the moves
+expected to kill more enemies than they lose.
+
 '''
 
 
 def genmoves(logfn, game):
     moves = {}
+    fights = None
     while True:
         env = yield moves
         moves = {}
 
-        for aI, (aN, _) in env.myid.iteritems():
-            if aI not in moves:
+        # counts within 3 ** 2 (exclusive) include the ant itself
+        support = env.influence('myant', 3 ** 2 - 1)
+        threat = env.influence('enemyant', 3 ** 2 - 1)
+        fought = set() # ants already part of a scored fight
+        food, myant = env.food, env.myant
+        def passable(loc):
+            # as the protocol resolves moves, counting my other ants as
+            # staying put
+            return loc not in food and loc not in myant
+        for aI, (aN, _) in env.ants():
+            sighted = aN not in fought and env.nearest('enemyant', aN)
+            if sighted:
+                t2, target = sighted
+                # skip fights where the enemy clearly has the upper hand
+                if support.at(aN) + 1 < threat.at(target) or \
+                   not env.ray(aN, target):
+                    continue
                 friends = env.digest('myant', aN)
-                enemies = env.digest('enemyant', aN)
-                if friends and enemies:
-                    t2, target = enemies[0]
-                    if env.ray(aN, target):
-                        enemies = env.digest('enemyant', target)[1:]
-                        myclump = [env.myant[f][0] for d2, f in friends \
-                                   if d2 < 3 ** 2 and f in env.myant]
-                        enclump = [e for d2, e in enemies \
-                                   if d2 < 3 ** 2] + [target]
-                        if len(myclump) > len(enclump):
-                            v1, v2 = am.naive_dir(aN, target)
-                            vect = v1 if random() < 0.75 else v2
-                            for aI in myclump + [aI]:
-                                moves[aI] = vect
+                enemies = env.digest('enemyant', target)
+                mine = [aN] + [f for d2, f in friends
+                               if d2 < 3 ** 2 and f in env.myant]
+                theirs = [e for d2, e in enemies if d2 < 3 ** 2]
+                if fights is None:
+                    fights = battle.Battle(env.geometry,
+                                           game['attackradius2'],
+                                           env.sight.water)
+                fought.update(mine)
+                plan = fights.search(mine, theirs, env.budget.checkin,
+                                     passable=passable)
+                if plan and plan[0] > 0:
+                    score, mydead, vects = plan
+                    for loc, vect in zip(mine, vects):
+                        moves.setdefault(env.myant[loc][0], vect)
         moves = env.supplement(moves)
@@ -0,0 +1,174 @@
+# stdlib
+import random
+# local
+import budget
+import environment
+
+
+'''
+Expert evaluation on worker processes for the meta-decider.
+
+A Pool forks persistent workers at the start of the game, each holding the
+generators of some of the experts (round robin by index) and its own
+environment digest, so expert state lives on in the worker across turns.
+
+Each turn the workers are sent a compact snapshot: the water first seen since
+the last turn, the other (small) layers less any ants the meta-decider set
+aside (with the ids of every living ant if it did), the layers it forgot, the
+order in which to take the ants and the time remaining. They run their
+experts against their own digests and send back the moves, which are put in
+expert order whatever order the workers finish in. Each worker keeps its copy
+of the game's ant registry up to date from the layers and ids, so rows are
+freed there as they are in the protocol's.
+Workers seed their random state from the game's player seed and their number.
+
+The workers' answers are awaited only until the turn's deadline, and the
+workers are told they have a share of the time left so that their moves can
+arrive before it. If a worker fails or is late, every worker is stopped;
+that turn the experts which did answer are used and the rest give no moves,
+and send() returns None from then on. If the workers cannot be started at
+all, send() returns None from the start. Either way the caller runs its
+experts serially from then on, its own generators taking over with the state
+they had when the game began, as they have seen none of the turns the
+workers ran.
+
+'''
+
+
+SHARE = 0.8 # fraction of the time left which the workers are told they have
+
+
+###############################################################################
+
+
+class Pool(object):
+    '''Experts run on persistent worker processes.'''
+
+    def __init__(self, experts, game, workers):
+        self.experts = experts      # expert modules (with genmoves)
+        self.conns = []             # multiprocessing Connection per worker
+        self.processes = []
+        self.layers = None          # this turn's layers but water
+        self.newwater = []          # wLocs of water first seen since last turn
+        workers = min(workers, len(experts))
+        seed = game.get('player_seed', 0)
+        try:
+            import multiprocessing
+            for w in xrange(workers):
+                parent, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(
+                    target=serve,
+                    args=(child, experts, range(w, len(experts), workers),
+                          game, seed + w))
+                process.daemon = True
+                process.start()
+                child.close()
+                self.conns.append(parent)
+                self.processes.append(process)
+        except Exception: # eg. no multiprocessing, or a daemonic parent
+            self.close()
+
+    def learn(self, newwater):
+        '''Take water first seen (an environment subscriber).'''
+        self.newwater.extend(newwater)
+
+    def take(self, layers):
+        '''Take the turn's layers as given to update_env.'''
+        self.layers = [dict(layer) for layer in layers[1:]]
+
+    def send(self, env, turnbudget):
+        '''Return the moves of every expert, in order, and the milliseconds
+        each took; or None if the workers are not available.
+
+        Experts whose worker fails or misses the turn's deadline give no
+        moves, and the workers are stopped.
+
+        '''
+        if not self.conns:
+            return None
+        if self.layers is None:
+            # warming up, before the first turn
+            return [{} for e in self.experts], [0.0] * len(self.experts)
+        layers = self.layers[:]
+        myant = layers[4]
+        alive = None
+        if len(env.myant) < len(myant):
+            # the meta-decider set some ants aside this turn
+            kept = set(aI for aI, _ in env.myant.itervalues())
+            layers[4] = {k: v for k, v in myant.iteritems() if v[0] in kept}
+            alive = [aI for aI, _ in myant.itervalues()]
+        remaining = turnbudget.remaining()
+        if remaining == float('inf'):
+            remaining = None
+        else:
+            remaining *= SHARE # the rest covers sending the moves back
+        message = (layers, alive, self.newwater, sorted(env.forgotten),
+                   env.priority, remaining)
+        self.newwater = []
+        moves = [{} for e in self.experts]
+        ms = [0.0] * len(self.experts)
+        try:
+            for conn in self.conns:
+                conn.send(message)
+            for conn in self.conns:
+                if remaining is None:
+                    wait = None
+                else:
+                    wait = max(turnbudget.deadline - budget.clock(), 0.0)
+                if not conn.poll(wait):
+                    break # late
+                for i, m, t in conn.recv():
+                    moves[i], ms[i] = m, t
+            else:
+                return moves, ms
+        except (EOFError, IOError, OSError):
+            pass
+        self.close()
+        return moves, ms
+
+    def close(self):
+        '''Stop the workers.'''
+        for conn in self.conns:
+            conn.close()
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        self.conns = []
+        self.processes = []
+
+
+def serve(conn, experts, indexes, game, seed):
+    '''Run some experts each turn in a worker until the pipe closes.'''
+    random.seed(seed)
+    env = environment.LazyEnvDigest(
+        (game['rows'], game['cols']), game['viewradius'], None,
+        game.get('geometry'))
+    generators = [(i, experts[i].genmoves(None, game)) for i in indexes]
+    for _, g in generators:
+        g.next() # coroutine warmup
+    registry = game['registry'] # this worker's copy
+    registry.cells = False      # the layers are keyed by (row, col)
+    water = {}
+    while True:
+        try:
+            (layers, alive, newwater, forgotten, priority,
+             remaining) = conn.recv()
+        except (EOFError, IOError):
+            return
+        water.update(dict.fromkeys(newwater, True))
+        env.discover(newwater)
+        env.update_env(water, *layers)
+        registry.update(layers[4], layers[5], alive)
+        for key in forgotten:
+            env.forget(key)
+        env.priority = priority
+        turnbudget = budget.Budget(remaining)
+        results = []
+        for n, (i, g) in enumerate(generators):
+            env.budget = turnbudget.share(len(generators) - n)
+            start = budget.clock()
+            moves = g.send(env)
+            results.append((i, moves, (budget.clock() - start) * 1000.0))
+        conn.send(results)
+
+###############################################################################
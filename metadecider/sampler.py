@@ -0,0 +1,38 @@
+# stdlib
+import random
+from math import log
+from itertools import izip
+
+
+'''
+Weighted random move orderings for the meta-decider.
+
+Every ant's row of a flat ants x vectors array of probabilities becomes a
+prioritized list of vectors, as if drawn one at a time without replacement,
+each in proportion to its probability among those left. Vectors of zero
+probability are left out; the protocol falls back to '=' past the end.
+
+Drawing in turn is the same as an exponential race (Efraimidis and Spirakis):
+each vector gets the key -log(u) / p for a uniform u, and the vectors are
+sorted by key. A whole ordering costs one random number per vector and a sort
+of at most five, with no cumulative sums.
+
+'''
+
+
+###############################################################################
+
+
+def orderings(probs, vectors, rng=random):
+    '''Return a list of prioritized vector lists, one per row of probs.'''
+    width = len(vectors)
+    uniform = rng.random
+    result = []
+    for base in xrange(0, len(probs), width):
+        keyed = [(-log(1.0 - uniform()) / p, v)
+                 for v, p in izip(vectors, probs[base:base + width]) if p > 0]
+        keyed.sort()
+        result.append([v for _, v in keyed])
+    return result
+
+###############################################################################
@@ -24,7 +24,7 @@ def genmoves(logfn, game):
                     arounds[h] = arounds[h].union(am.eightsquare(n))
                 arounds[h] = arounds[h].difference([h] + am.neighbors(h))
 
-        for aI, (aN, _) in env.myid.iteritems():
+        for aI, (aN, _) in env.ants():
             hills = env.digest('myhill', aN)
             if hills:
                 d2, h = hills[0]
@@ -0,0 +1,110 @@
+# stdlib
+import random
+
+
+'''
+Load shedding for the meta-decider.
+
+Each turn a Triage ranks my ants by urgency: enemies close by (more so within
+a step or two of attack range), food, a hill of either side, a change in that
+situation since last turn, and the turns an ant has waited since the experts
+last saw it, so every ant has its turn. The experts take the ants in that
+order.
+
+How many ants the experts are given is driven by measured cost. After each
+turn the number is scaled by how far the time taken by the ranking and the
+experts together fell short of (or ran over) their share of the time that
+was left, at most doubling or halving in one turn; without a turn time limit
+every ant is kept. The ranking reads influence maps, whose cost follows the
+objects seen rather than my ants, and leaves per-ant queries to the experts. The ants past the
+cutoff are set aside in the environment and move by the preference order they
+were last given, or a random one.
+
+'''
+
+
+SHARE = 0.75    # fraction of the time left which the experts should take
+FLOOR = 16      # fewest ants kept when shedding
+
+
+###############################################################################
+
+
+class Triage(object):
+    '''Urgency ranking with a cutoff set by the experts' measured time.'''
+
+    def __init__(self, game):
+        self.close2 = (game['attackradius'] + 2) ** 2
+        self.capacity = None    # ants the experts can take (None: all)
+        self.allowed = None     # milliseconds allowed this turn
+        self.waited = {}        # id --> turns since the experts saw the ant
+        self.situation = {}     # id --> situation last turn
+        self.orders = {}        # id --> the last prioritized vectors given
+
+    def urgency(self, env):
+        '''Return a dict id --> urgency of each of my ants.
+
+        Each ant's situation is read from the turn's influence maps, which
+        cost in proportion to the objects seen rather than to my ants.
+
+        '''
+        rad2 = env.rad2
+        close = env.influence('enemyant', self.close2).counts
+        enemy = env.influence('enemyant', rad2).counts
+        food = env.influence('food', rad2).counts
+        myhill = env.influence('myhill', rad2).counts
+        enemyhill = env.influence('enemyhill', rad2).counts
+        cell = env.geometry.cell
+        waited, situation = self.waited, self.situation
+        scores = {}
+        now = {}
+        for aI, (aN, _) in env.myid.iteritems():
+            c = cell(aN)
+            near = 2 if close[c] else 1 if enemy[c] else 0
+            seen = (near, food[c] > 0, myhill[c] > 0 or enemyhill[c] > 0)
+            now[aI] = seen
+            scores[aI] = (4 * near + 2 * seen[1] + 3 * seen[2] +
+                          2 * (situation.get(aI) != seen) + waited.get(aI, 0))
+        self.situation = now
+        return scores
+
+    def select(self, env, turnbudget):
+        '''Rank my ants, set aside those past the cutoff and return them as
+        a dict id --> wLoc.'''
+        self.allowed = turnbudget.remaining() * SHARE
+        if not env.myant:
+            return {}
+        scores = self.urgency(env)
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        if self.allowed == float('inf'):
+            self.capacity = None
+        keep = ranked if self.capacity is None else ranked[:self.capacity]
+        shed = {aI: env.myid[aI][0] for aI in ranked[len(keep):]}
+        self.waited = {aI: self.waited.get(aI, 0) + 1 for aI in shed}
+        env.priority = keep
+        if shed:
+            env.setaside(shed)
+        return shed
+
+    def measure(self, ants, ms):
+        '''Take the time the ranking and the experts took for the ants the
+        experts were given.'''
+        if not ants or self.allowed is None or self.allowed == float('inf'):
+            return
+        rate = self.allowed / ms if ms > 0 else 2.0
+        capacity = int(ants * min(max(rate, 0.5), 2.0))
+        self.capacity = max(capacity, FLOOR)
+
+    def remember(self, orders):
+        '''Take the prioritized vectors (by id) given to the ants kept.'''
+        orders.update((aI, self.orders[aI])
+                      for aI in self.waited if aI in self.orders)
+        self.orders = orders
+
+    def defaults(self, shed):
+        '''Return prioritized vectors (by wLoc) for the ants set aside.'''
+        orders = self.orders
+        return {aN: orders[aI] if aI in orders else random.sample('NESW', 4)
+                for aI, aN in shed.iteritems()}
+
+###############################################################################
@@ -18,7 +18,7 @@ def genmoves(logfn, game):
         env = yield moves
         moves = {}
 
-        for aI, (aN, _) in env.myid.iteritems():
+        for aI, (aN, _) in env.ants():
             neighbors = antmath.neighbors(aN)
             walls = set(n for n in neighbors if n in env.water)
             if walls:
@@ -0,0 +1,191 @@
+# stdlib
+import heapq
+import collections
+# local
+from antmath import torus_delta
+
+
+'''
+Pathfinding on the torus for the ants bots.
+
+Paths finds shortest routes around known water with A* and keeps a bounded,
+least recently used cache of them keyed by (start region, goal), where a
+region is a square block of the map. A later request from anywhere on a
+cached route, such as the next cell of an ant which followed it, is answered
+from the cache, as is a request from a cell next to the cached route.
+
+When water is discovered only the cached routes through it are dropped, found
+through an index from each cell to the routes crossing it. Searches which
+fail are remembered by the same key until more water is discovered.
+
+A Route is a list of Cells from start to goal, both included. Cells are
+geometry.Kernel Cells.
+
+'''
+
+
+DIRECTIONS = 'NESW' # order of a Kernel.neighbor_cells row
+
+
+###############################################################################
+
+
+class Paths(object):
+    '''A* routes over a water bitmap with a bounded route cache.'''
+
+    def __init__(self, kernel, water=None, capacity=1024, region=4,
+                 limit=4096):
+        self.kernel = kernel
+        if water is None:
+            water = bytearray(kernel.rows * kernel.cols)
+        self.water = water          # bytearray; nonzero cells are impassable
+        self.capacity = capacity    # routes kept
+        self.region = region        # side of a start region
+        self.limit = limit          # cells A* may expand per search
+        self.routes = collections.OrderedDict() # key --> Route, {Cell: index}
+        self.crossing = {}          # Cell --> set of keys of routes on it
+        self.failed = set()         # keys with no route (until new water)
+        self.hits = self.misses = 0
+
+    #
+    # search
+
+    def search(self, start, goal, limit=None):
+        '''Return the shortest Route from start to goal Cells or None.'''
+        if self.water[start] or self.water[goal]:
+            return None
+        if start == goal:
+            return [start]
+        h, w = self.kernel.rows, self.kernel.cols
+        locs = self.kernel.locs
+        gr, gc = locs[goal]
+        # torus Manhattan distance to the goal by row and by column
+        rowleft = [abs(torus_delta(gr - r, h)) for r in xrange(h)]
+        colleft = [abs(torus_delta(gc - c, w)) for c in xrange(w)]
+        neighbor_cells, water = self.kernel.neighbor_cells, self.water
+        came = {start: None}
+        cost = {start: 0}
+        r, c = locs[start]
+        frontier = [(rowleft[r] + colleft[c], start)]
+        expanded = 0
+        limit = self.limit if limit is None else limit
+        while frontier:
+            _, cell = heapq.heappop(frontier)
+            if cell == goal:
+                route = []
+                while cell is not None:
+                    route.append(cell)
+                    cell = came[cell]
+                route.reverse()
+                return route
+            expanded += 1
+            if expanded > limit:
+                return None
+            g = cost[cell] + 1
+            for n in neighbor_cells[cell]:
+                if not water[n] and g < cost.get(n, g + 1):
+                    cost[n] = g
+                    came[n] = cell
+                    r, c = locs[n]
+                    heapq.heappush(frontier, (g + rowleft[r] + colleft[c], n))
+        return None
+
+    #
+    # cache
+
+    def key(self, start, goal):
+        s = self.region
+        r, c = divmod(start, self.kernel.cols)
+        return r // s, c // s, goal
+
+    def cached(self, key, start):
+        '''Return the cached Route for key from start, if it can be had.'''
+        try:
+            route, index = self.routes.pop(key)
+        except KeyError:
+            return None
+        self.routes[key] = route, index # most recently used
+        if start in index:
+            return route[index[start]:]
+        # join the cached route from a neighbor on it
+        for n in self.kernel.neighbor_cells[start]:
+            if n in index and not self.water[n]:
+                return [start] + route[index[n]:]
+        return None
+
+    def store(self, key, route):
+        self.drop(key)
+        if len(self.routes) >= self.capacity:
+            self.drop(next(iter(self.routes))) # least recently used
+        self.routes[key] = route, {cell: i for i, cell in enumerate(route)}
+        for cell in route:
+            self.crossing.setdefault(cell, set()).add(key)
+
+    def drop(self, key):
+        try:
+            route, index = self.routes.pop(key)
+        except KeyError:
+            return
+        for cell in route:
+            keys = self.crossing.get(cell)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self.crossing[cell]
+
+    #
+    # api
+
+    def route(self, start, goal):
+        '''Return the Route between two Locs (wrapped first) or None.'''
+        cell = self.kernel.cell
+        start, goal = cell(start), cell(goal)
+        key = self.key(start, goal)
+        route = self.cached(key, start)
+        if route is not None or key in self.failed:
+            self.hits += 1
+            return route
+        self.misses += 1
+        route = self.search(start, goal)
+        if route is not None:
+            self.store(key, route)
+        else:
+            if len(self.failed) >= self.capacity:
+                self.failed.clear()
+            self.failed.add(key)
+        return route
+
+    def direction(self, start, goal):
+        '''First NESW step of the route between two Locs.
+
+        Return '=' when already there and None when there is no route.
+
+        '''
+        route = self.route(start, goal)
+        if route is None:
+            return None
+        if len(route) == 1:
+            return '='
+        return DIRECTIONS[self.kernel.neighbor_cells[route[0]].index(route[1])]
+
+    def distance(self, start, goal):
+        '''Steps along the route between two Locs or None.'''
+        route = self.route(start, goal)
+        return None if route is None else len(route) - 1
+
+    def discover(self, newwater):
+        '''Add newly seen water (Locs) and drop the routes through it, and
+        the failures.'''
+        cell = self.kernel.cell
+        if newwater:
+            self.failed.clear()
+        for loc in newwater:
+            c = cell(loc)
+            self.water[c] = 1
+            for key in list(self.crossing.get(c, ())):
+                self.drop(key)
+
+    def __len__(self):
+        return len(self.routes)
+
+###############################################################################
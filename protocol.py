@@ -1,11 +1,16 @@
 # stdlib
-from datetime import datetime as DateTime
 from math import sqrt as math_sqrt
 from random import seed as random_seed
 from collections import defaultdict as collections_defaultdict
-from itertools import repeat as itertools_repeat
 # local
 import antmath
+from grid import Layer as grid_Layer
+from geometry import Kernel as geometry_Kernel
+from registry import Registry as registry_Registry
+from resolver import resolve as resolver_resolve
+from budget import Budget as budget_Budget, clock as budget_clock
+from instrument import Spans as instrument_Spans
+from logger import leveled as logger_leveled, DEBUG as logger_DEBUG
 
 
 '''
@@ -28,9 +33,26 @@ Ant property identifier suffixes:
 
 class Bot(object):
 
-    def __init__(self, decider, logfn=None):
+    # fraction of the turn time held back from the decider's budget
+    RESERVE = 0.25
+
+    def __init__(self, decider, logfn=None, grid=False, spans=None,
+                 cells=False):
         '''Takes a Decider instance which makes decisions about the game.
-        Optionally takes a function to log strings.
+        Optionally takes a function to log strings; a logger.Logger defers
+        formatting and writing until it is drained.
+
+        In grid mode the water, food, enemyhill and enemyant state is kept in
+        per-cell arrays (see grid.py) and the decider receives read-only,
+        dict-compatible views of them instead of dictionaries and copies.
+
+        Optionally takes an instrument.Spans to collect per-phase timings;
+        its report is written when the game ends.
+
+        In cells mode every location the protocol keeps is an integer Cell,
+        row * cols + col (see geometry.py), rather than a tuple. Deciders
+        still get (row, col) locations, converted at think(). The grid and
+        cells modes cannot be combined.
 
         The Decider must have the following methods:
 
@@ -51,6 +73,10 @@ class Bot(object):
                     spawnradius2    (squared)
                     spawnradius
                     player_seed     (random seed)
+                    budget          (budget.Budget; reset each turn)
+                    spans           (instrument.Spans)
+                    geometry        (geometry.Kernel)
+                    registry        (registry.Registry; my ants, by id)
 
             def think(water, food, enemyhill, enemyant, myhill, myant, mydead):
 
@@ -70,9 +96,27 @@ class Bot(object):
                    keys as myant, each mapping to a prioritized list of vectors
                    from this list: N, E, S, W, =
 
+        The Decider may also have this method:
+
+            def discover(newwater):
+
+                -- will be called each turn just before think
+                -- the argument is a list of the water locations first seen
+                   this turn
+                -- think's water argument is then the protocol's own, live
+                   state rather than a copy, and must not be modified
+
         '''
+        if grid and cells:
+            raise ValueError('grid and cells modes cannot be combined')
         self.decider = decider
-        self.logfn = logfn
+        self.logfn = logger_leveled(logfn)
+        self.grid = grid
+        self.cells = cells
+        self.incremental = hasattr(decider, 'discover')
+        self.spans = spans or instrument_Spans(enabled=False)
+        self.geometry = None # geometry.Kernel once the map size is known
+        self.registry = None # registry.Registry once the map size is known
         # message handlers
         self.handlers = collections_defaultdict(lambda: lambda *args: None)
         for msg in ['player_seed','loadtime','turntime','turns','rows','cols']:
@@ -82,20 +126,28 @@ class Bot(object):
         self.handlers['ready'] = lambda *args   : self.pregame() or ['go']
         self.handlers['turn'] = lambda msg, num : self.presense(msg, num)
         self.handlers['go'] = lambda *args      : self.postsense() + ['go']
-        self.handlers['w'] = lambda msg, r, c   : self.sense_water((r, c))
-        self.handlers['f'] = lambda msg, r, c   : self.sense_food ((r, c))
-        self.handlers['h'] = lambda msg, r, c, o: self.sense_hill((r, c), o)
-        self.handlers['a'] = lambda msg, r, c, o: self.sense_ant ((r, c), o)
-        self.handlers['d'] = lambda msg, r, c, o: self.sense_dead((r, c), o)
+        self.handlers['end'] = lambda *args     : self.endgame()
+        at = lambda r, c: self.at(r, c)
+        self.handlers['w'] = lambda msg, r, c   : self.sense_water(at(r, c))
+        self.handlers['f'] = lambda msg, r, c   : self.sense_food (at(r, c))
+        self.handlers['h'] = lambda msg, r, c, o: self.sense_hill(at(r, c), o)
+        self.handlers['a'] = lambda msg, r, c, o: self.sense_ant (at(r, c), o)
+        self.handlers['d'] = lambda msg, r, c, o: self.sense_dead(at(r, c), o)
+        self.at = lambda r, c: (r, c) # row, col --> loc
         # game details
         self.game = {}
         # game state (never cleared)
         self.anttotal   = 0
         self.water      = {} # map loc --> True
+        self.watercopy  = {} # map (row, col) --> True (cells mode, converted)
         self.myhill0    = {} # map loc --> False
         # turn state (cleared each turn; usually in presense)
         self.timer      = None
+        self.parsetime  = None # milliseconds
+        self.thinktime  = None # milliseconds
+        self.budget     = budget_Budget()
         self.turn       = None
+        self.newwater   = [] # locs of water first seen this turn
         self.food       = {} # map loc --> True
         self.enemyhill  = {} # map loc --> int
         self.enemyant   = {} # map loc --> int
@@ -110,6 +162,33 @@ class Bot(object):
         msg = args.pop(0)
         return self.handlers[msg](msg, *map(int, args))
 
+    def handle_block(self, block):
+        '''Handle a block of lines such as a whole turn (through "go").
+
+        Water, food and ant lines are parsed in place; any other line goes
+        through the regular handlers. Return the replies to the last line
+        which had any.
+
+        '''
+        replies = None
+        at = self.at
+        for line in block.splitlines():
+            tok = line.split()
+            if not tok:
+                continue
+            msg = tok[0]
+            if msg == 'w':
+                self.sense_water(at(int(tok[1]), int(tok[2])))
+            elif msg == 'f':
+                self.food[at(int(tok[1]), int(tok[2]))] = True
+            elif msg == 'a':
+                self.sense_ant(at(int(tok[1]), int(tok[2])), int(tok[3]))
+            else:
+                replies = self.handlers[msg](msg, *map(int, tok[1:])) \
+                          or replies
+                at = self.at # set up once the map size is known
+        return replies
+
     def handle_number(self, msg, val):
         self.game[msg] = int(val)
 
@@ -119,24 +198,44 @@ class Bot(object):
 
     def pregame(self):
         random_seed(self.game['player_seed'])
+        self.budget = budget_Budget(self.game['turntime'],
+                                    self.game['turntime'] * self.RESERVE)
+        self.game['budget'] = self.budget
+        self.game['spans'] = self.spans
+        size = self.game['rows'], self.game['cols']
+        self.geometry = geometry_Kernel(size)
+        self.game['geometry'] = self.geometry
+        self.registry = registry_Registry(self.geometry, self.cells)
+        self.game['registry'] = self.registry
+        if self.cells:
+            self.at = self.geometry.cellat
+        if self.grid:
+            self.water      = grid_Layer(size, flag=True)
+            self.food       = grid_Layer(size, flag=True)
+            self.enemyhill  = grid_Layer(size)
+            self.enemyant   = grid_Layer(size)
         self.decider.start(self.game)
 
     def presense(self, msg, num):
-        self.timer = DateTime.now()
+        self.timer = budget_clock()
+        self.budget.reset()
         self.turn = num
-        self.logfn and self.logfn('TURN #{} presense'.format(num))
+        del self.newwater[:]
+        self.logfn and self.logfn.info('turn', 'TURN #{} presense', num)
         self.food.clear()
         self.enemyhill.clear()
         self.enemyant.clear()
         self.myhill.clear()
         self.myant.clear()
         self.mydead.clear()
-        if self.logfn:
+        if self.logfn and self.logfn.enabled(logger_DEBUG, 'plans'):
             for k, v in self.antplans.iteritems():
-                self.logfn('plan {} <-- {}'.format(k, v))
+                self.logfn.debug('plans', 'plan {} <-- {}', k, v)
 
     def sense_water(self, loc):
-        self.water[loc] = True
+        if loc not in self.water:
+            self.water[loc] = True
+            self.newwater.append(loc)
 
     def sense_food(self, loc):
         self.food[loc] = True
@@ -159,6 +258,11 @@ class Bot(object):
         if owner == 0:
             self.mydead[loc] = True
 
+    def endgame(self):
+        '''Report the game's timings once the game is over.'''
+        self.logfn and self.logfn('spans\n' + self.spans.report())
+        self.spans.write()
+
     def recognize_moved(self, loc):
         '''Recognize an ant which moved. Clear its plan.
         Return a 2-tuple of loc & plan.
@@ -174,8 +278,8 @@ class Bot(object):
         Return a 2-tuple of loc & plan.
 
         '''
-        fail = [f for f in antmath.neighbors(loc) \
-                if (self.wrap(f) in self.antplans and
+        fail = [f for f in self.adjacent(loc) \
+                if (f in self.antplans and
                     self.antplans[f][0] == loc)]
         if fail:
             return fail[0], self.antplans.pop(fail[0])
@@ -193,20 +297,26 @@ class Bot(object):
 
     def gen_sensor(self, msg=''):
         #staticmethod
+        log = self.logfn if self.logfn and \
+                            self.logfn.enabled(logger_DEBUG, 'ants') else None
         def fn(todict, plan):
             aN, (aO, aI, aD, aV) = plan
             todict[aN] = aI, aO
-            if self.logfn:
+            if log:
                 if aN == aO and aD != '=':
-                    self.logfn('Ant #{} at {} -FAIL{}-> {}{}'.\
-                               format(aI, aO, aD, aN, ' ' + msg))
+                    log.debug('ants', 'Ant #{} at {} -FAIL{}-> {} {}',
+                              aI, aO, aD, aN, msg)
                 else:
-                    self.logfn('Ant #{} at {} -{}-> {}{}'.\
-                               format(aI, aO, aD, aN, ' ' + msg))
+                    log.debug('ants', 'Ant #{} at {} -{}-> {} {}',
+                              aI, aO, aD, aN, msg)
         return fn
 
     def postsense(self):
-        self.logfn and self.logfn('TURN #{} postsense '.format(self.turn))
+        self.parsetime = self.budget.elapsed()
+        self.spans.add('parse', self.parsetime)
+        t = budget_clock()
+        self.logfn and self.logfn.info('turn', 'TURN #{} postsense ',
+                                       self.turn)
         #
         # recognize our dead ants
         mydead = {}
@@ -231,10 +341,12 @@ class Bot(object):
             aI = self.anttotal
             self.anttotal += 1
             myant[loc] = aI, loc
-            self.logfn and self.logfn('Ant #{} at {} born'.format(aI, loc))
+            self.logfn and self.logfn.debug('ants', 'Ant #{} at {} born',
+                                            aI, loc)
         #assert self.myant == {} # all were recognized
         self.myant = myant
         del myant # don't use the local ref
+        self.registry.update(self.myant, self.mydead)
         #
         # all living and dead ants are recognized
         #assert self.antplans == {}
@@ -245,17 +357,29 @@ class Bot(object):
         hills.update(self.myhill)  # adds true for my visible and active hills
         #
         # query where ants should go
-        decidertime = DateTime.now()
-        moves = self.decider.think(
-            self.water.copy(),
-            self.food,
-            self.enemyhill,
-            self.enemyant,
+        t = self.spans.mark('recognize', t)
+        if self.grid:
+            water = self.water.view
+        else:
+            water = self.water if self.incremental else self.water.copy()
+        layers = (
+            water,
+            self.share(self.food),
+            self.share(self.enemyhill),
+            self.share(self.enemyant),
             hills,
             self.myant.copy(),
             self.mydead,
         )
-        decidertime = (DateTime.now() - decidertime).total_seconds()
+        if self.cells:
+            moves = self.think_locs(*layers)
+        else:
+            if self.incremental:
+                self.decider.discover(list(self.newwater))
+            moves = self.decider.think(*layers)
+        now = self.spans.mark('decider', t)
+        self.thinktime = decidertime = (now - t) * 1000.0
+        t = now
         #
         # filter moves to only ants that actually exist
         moves = {loc:vectors for loc, vectors in moves.iteritems() \
@@ -264,62 +388,78 @@ class Bot(object):
         # add a 'stay' order for each ant that was left-out
         # copy ant ids from myant to moves
         for loc, (antid, oldloc) in self.myant.iteritems():
-            if loc not in moves:
-                moves[loc] = itertools_repeat('=')
-            elif type(moves[loc]) == type([]):
-                moves[loc] = (v for v in moves[loc])
-            moves[loc] = (antid, moves[loc])
-        #
-        # def for use later:
-        # get next move which doesn't place the ant on water or food
-        def poporder(oldloc, vectors):
-            try:
-                vector = vectors.next()
-            except StopIteration:
-                vector = '='
-            newloc = self.wrap(antmath.displace_loc(vector, oldloc))
-            return (newloc, vector) \
-                   if newloc not in self.water and newloc not in self.food \
-                   else poporder(oldloc, vectors)
+            moves[loc] = (antid, moves.get(loc, '='))
         #
         # assign ants to locations; resolve conflicts for the same location
-        # gale-shapley stable matching algorithm
-        # - single men "moves" oldloc:(identity,[vector])
-        # - single women "antplans" any key which isn't set
-        # - couples "antplans" newloc:(oldloc,identity,vector,[vector])
-        # sorry about the long lines here...
-        self.antplans.clear()
-        while moves:
-            for aO, (aI, aV) in moves.items():              # each ant "a"
-                aN, aD = poporder(aO, aV)                   # proposes to a location
-                if aN in self.antplans:                     # if the location is claimed
-                    if aD == '=':                           #   but prefers "a"
-                        bO, bI, bD, bV = self.antplans[aN]  #     get the claimant "b"
-                        moves[bO] = bI, bV                  #     remove the claim of "b"
-                        self.antplans[aN] = (aO, aI, aD, aV)#     set a claim for "a"
-                        del moves[aO]                       #     "a" is no longer single
-                else:                                       # if the location is free
-                    self.antplans[aN] = (aO, aI, aD, aV)    #   set a claim for "a"
-                    del moves[aO]                           #   "a" is no longer single
+        # ants may not move onto water or food
+        self.antplans = resolver_resolve(moves, self.step, self.passable)
+        self.spans.mark('resolve', t)
         #
         # log elapsed time
         if self.logfn:
             maxtime = self.game['turntime']
-            decidertime *= 1000.0
-            totaltime = (DateTime.now() - self.timer).total_seconds() * 1000.0
-            self.logfn('''AntCt: {} Time: {:f}ms of {:.2f}ms; {:f}ms decider,
-                          {:f}ms protocol'''.\
-                          format(len(self.antplans), totaltime, maxtime,
-                          decidertime, totaltime - decidertime))
+            totaltime = (budget_clock() - self.timer) * 1000.0
+            self.logfn.info('time',
+                            '''AntCt: {} Time: {:f}ms of {:.2f}ms; {:f}ms parse,
+                          {:f}ms decider, {:f}ms protocol''',
+                            len(self.antplans), totaltime, maxtime,
+                            self.parsetime, decidertime,
+                            totaltime - decidertime - self.parsetime)
         #
         # issue orders to ants who are to move
-        return ['o {} {} {}'.format(row, col, vector) \
-                for newloc, ((row, col), identity, vector, vectors) \
-                in self.antplans.iteritems() \
-                if vector != '=']
+        locs = self.geometry.locs if self.cells else None
+        orders = []
+        for oldloc, identity, vector, vectors in self.antplans.itervalues():
+            if vector != '=':
+                row, col = locs[oldloc] if locs else oldloc
+                orders.append('o {} {} {}'.format(row, col, vector))
+        return orders
+
+    def think_locs(self, water, food, enemyhill, enemyant, myhill, myant,
+                   mydead):
+        '''Ask a (row, col) decider about Cell-keyed state (cells mode).'''
+        locs, cell = self.geometry.locs, self.geometry.cell
+        newwater = [locs[c] for c in self.newwater]
+        self.watercopy.update((loc, True) for loc in newwater)
+        if self.incremental:
+            self.decider.discover(newwater)
+        def convert(layer):
+            return {locs[c]: v for c, v in layer.iteritems()}
+        def convert_ants(layer):
+            return {locs[c]: (i, locs[o]) for c, (i, o) in layer.iteritems()}
+        moves = self.decider.think(
+            self.watercopy if self.incremental else self.watercopy.copy(),
+            convert(food),
+            convert(enemyhill),
+            convert(enemyant),
+            convert(myhill),
+            convert_ants(myant),
+            convert_ants(mydead),
+        )
+        return {cell(loc): vectors for loc, vectors in moves.iteritems()}
+
+    def share(self, layer):
+        '''Give the decider a layer of per-turn state.'''
+        return layer.view if self.grid else layer
+
+    def step(self, loc, vector):
+        '''Find the on-map location after displacing in the given direction.'''
+        if self.cells:
+            return self.geometry.cell_step(loc, vector)
+        return self.geometry.step(loc, vector)
+
+    def adjacent(self, loc):
+        '''Return the on-map NESW neighbors of an on-map location.'''
+        if self.cells:
+            return self.geometry.cell_neighbors(loc)
+        return [self.wrap(f) for f in antmath.neighbors(loc)]
+
+    def passable(self, loc):
+        '''May an ant move onto the (wrapped) location?'''
+        return loc not in self.water and loc not in self.food
 
     def wrap(self, loc):
         '''Finds the true on-map coordinates of an unwrapped location.'''
-        return antmath.wrap_loc(loc, (self.game['rows'], self.game['cols']))
+        return self.geometry.wrap_loc(loc)
 
 ###############################################################################
@@ -0,0 +1,113 @@
+# stdlib
+from array import array
+
+
+'''
+Per-ant state for the ants bots.
+
+A Registry keeps a row for each of my living ants, keyed by the protocol's
+ant ids, in columns: arrays of the Cell of every ant and the Cell it came
+from, and named object columns for the deciders' and experts' own state
+(goals, histories and the like). The arrays, with ids, are a batch view of
+every ant; free rows have the id NONE.
+
+The protocol updates the Registry each turn once it has recognized its ants.
+Rows of dead ants are freed, as are those of ants which went missing without
+being recognized as dead, and reused for ants born later, so storage is
+bounded by the most ants alive at once.
+
+Cells are geometry.Kernel Cells.
+
+'''
+
+
+NONE = -1 # id of a free row
+
+
+###############################################################################
+
+
+class Registry(object):
+    '''Columnar table of per-ant state with rows freed on death.'''
+
+    def __init__(self, kernel, cells=False):
+        self.kernel = kernel
+        self.cells = cells          # are update's locations Cells?
+        self.rows = {}              # id --> row
+        self.free = []              # rows to reuse
+        self.ids = array('l')       # row --> id or NONE
+        self.loc = array('l')       # row --> Cell
+        self.oldloc = array('l')    # row --> Cell last turn
+        self.columns = {}           # name --> list<any> (row --> value)
+        self.defaults = {}          # name --> value of a fresh row
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, aI):
+        return aI in self.rows
+
+    def column(self, name, default=None):
+        '''Return a named object column (row --> value), adding it with the
+        default for every row if it is new.
+
+        The list is updated in place as rows are added and freed.
+
+        '''
+        try:
+            return self.columns[name]
+        except KeyError:
+            self.defaults[name] = default
+            column = self.columns[name] = [default] * len(self.ids)
+            return column
+
+    def add(self, aI):
+        '''Give an ant a row and return it.'''
+        if self.free:
+            row = self.free.pop()
+            self.ids[row] = aI
+        else:
+            row = len(self.ids)
+            self.ids.append(aI)
+            self.loc.append(NONE)
+            self.oldloc.append(NONE)
+            for name, column in self.columns.iteritems():
+                column.append(self.defaults[name])
+        self.rows[aI] = row
+        return row
+
+    def remove(self, aI):
+        '''Free an ant's row, if it has one.'''
+        row = self.rows.pop(aI, None)
+        if row is None:
+            return
+        self.ids[row] = NONE
+        self.loc[row] = self.oldloc[row] = NONE
+        for name, column in self.columns.iteritems():
+            column[row] = self.defaults[name]
+        self.free.append(row)
+
+    def update(self, myant, mydead, alive=None):
+        '''Take the turn's ants, as the protocol keeps them.
+
+        myant and mydead map locations to (id, old location). The dead and
+        any ant neither in myant nor among the ids alive (if myant leaves
+        some living ants out) lose their rows; the ants in myant are moved,
+        the newborn added.
+
+        '''
+        for aI, _ in mydead.itervalues():
+            self.remove(aI)
+        alive = set(aI for aI, _ in myant.itervalues()).union(alive or ())
+        for aI in [aI for aI in self.rows if aI not in alive]:
+            self.remove(aI)
+        cell = (lambda loc: loc) if self.cells else self.kernel.cell
+        rows, loc, oldloc = self.rows, self.loc, self.oldloc
+        for aN, (aI, aO) in myant.iteritems():
+            row = rows.get(aI)
+            if row is None:
+                row = self.add(aI)
+            loc[row] = cell(aN)
+            oldloc[row] = cell(aO)
+
+###############################################################################
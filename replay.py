@@ -0,0 +1,175 @@
+# stdlib
+import re
+import sys
+import gzip
+import time
+# local
+import protocol
+import decider
+import instrument
+
+
+'''
+Replays a transcript recorded with "MyBot.py --record FILE".
+
+Feeds the recorded input back into a protocol.Bot as fast as the CPU allows
+(the recorded player_seed comes along with it), with the recorded decider and
+bot options (--grid, --cells, --workers), and reports per-turn latency. The
+replayed orders are compared against the recorded ones, so a replay with no
+mismatches is a deterministic reproduction of the game.
+
+Orders only match on turns whose decisions did not depend on time: a turn on
+which Hedge's triage set ants aside, a pool worker missed the deadline or a
+decider ran out of its turn budget (eg. KMeans routing) generally differs on
+replay without anything having regressed. Replay a game played without a
+turn time limit, or one with few ants, to compare orders exactly.
+
+A Block is a string of input lines through a "ready", "go" or "end" line.
+
+'''
+
+
+BLOCKEND = re.compile(r'^(?:ready|go|end)\s*$')
+
+
+###############################################################################
+
+
+def transcript(fn):
+    '''Read a transcript.
+
+    Return a 3-tuple: the recorded decider name (or None), the list of
+    recorded bot options (or None) and a list of 2-tuples (Block, list<str>)
+    pairing each input Block with the recorded output lines that followed
+    it.
+
+    '''
+    decname = None
+    options = None
+    turns = []
+    block = []
+    f = gzip.open(fn, mode='rb')
+    try:
+        for line in f:
+            if line.startswith('# decider '):
+                decname = line.split()[2]
+            elif line.startswith('# options'):
+                options = line.split()[2:]
+            elif line.startswith('> '):
+                turns[-1][1].append(line[2:].rstrip('\n'))
+            elif not block and not line.strip():
+                continue # eg. the newline after "go" which --batch reads
+            else:
+                block.append(line)
+                if BLOCKEND.match(line):
+                    turns.append((''.join(block), []))
+                    block = []
+    except (EOFError, IOError):
+        pass # recording was cut short; keep what was read
+    finally:
+        f.close()
+    if block:
+        turns.append((''.join(block), []))
+    return decname, options, turns
+
+
+def replay(fn, decname=None, grid=None, spans=None, cells=None, workers=None):
+    '''Replay a transcript; yield a dictionary of measurements per turn.
+
+    The grid, cells and workers options default to those recorded.
+    Optionally takes an instrument.Spans to collect per-phase timings.
+
+    '''
+    recname, recopts, turns = transcript(fn)
+    recopts = recopts or []
+    decname = decname or recname or decider.DEFAULT[0]
+    if grid is None:
+        grid = '--grid' in recopts
+    if cells is None:
+        cells = '--cells' in recopts
+    if workers is None and '--workers' in recopts:
+        workers = int(recopts[recopts.index('--workers') + 1])
+    options = {} if workers is None else {'workers': workers}
+    bot = protocol.Bot(decider.DECIDERS[decname](None, **options), None,
+                       grid, spans, cells)
+    for block, recorded in turns:
+        start = time.time()
+        replies = bot.handle_block(block) or []
+        total = (time.time() - start) * 1000.0
+        if not block.startswith('turn') or not block.rstrip().endswith('go'):
+            continue # setup, or the final state after "end"
+        mismatch = len(set(replies) ^ set(recorded))
+        yield {
+            'turn'      : bot.turn,
+            'ants'      : len(bot.myant),
+            'total'     : total,
+            'parse'     : bot.parsetime,
+            'decider'   : bot.thinktime,
+            'protocol'  : total - bot.parsetime - bot.thinktime,
+            'mismatch'  : mismatch,
+        }
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def main():
+    '''python replay.py [--decider NAME] [--grid|--cells] [--workers N]
+    [--quiet] FILE
+
+    Options not given are those recorded.
+
+    '''
+    args = sys.argv[1:]
+    decname = None
+    if '--decider' in args:
+        i = args.index('--decider')
+        args.pop(i)
+        try:
+            decname = args.pop(i)
+        except IndexError:
+            raise ValueError('--decider option requires an argument')
+    grid = '--grid' in args or None
+    grid and args.remove('--grid')
+    cells = '--cells' in args or None
+    cells and args.remove('--cells')
+    workers = None
+    if '--workers' in args:
+        i = args.index('--workers')
+        args.pop(i)
+        try:
+            workers = int(args.pop(i))
+        except (IndexError, ValueError):
+            raise ValueError('--workers option requires a number')
+    if grid or cells:
+        grid, cells = bool(grid), bool(cells) # instead of those recorded
+    quiet = '--quiet' in args
+    quiet and args.remove('--quiet')
+    if len(args) != 1:
+        raise ValueError('usage: ' + main.__doc__)
+    #
+    rows = []
+    spans = instrument.Spans()
+    for row in replay(args[0], decname, grid, spans, cells, workers):
+        rows.append(row)
+        quiet or sys.stdout.write(
+            'turn {turn:4d} ants {ants:4d} total {total:9.3f}ms '
+            'parse {parse:8.3f}ms decider {decider:9.3f}ms '
+            'protocol {protocol:8.3f}ms{}\n'.format(
+                ' MISMATCH' if row['mismatch'] else '', **row))
+    if not rows:
+        raise ValueError('{}: no turns to replay'.format(args[0]))
+    for key in ('total', 'parse', 'decider', 'protocol'):
+        values = [row[key] for row in rows]
+        sys.stdout.write('{:>8}: mean {:9.3f}ms p95 {:9.3f}ms max {:9.3f}ms\n'.
+                         format(key, sum(values) / len(values),
+                                percentile(values, 0.95), max(values)))
+    sys.stdout.write('{} turns, {} with mismatched orders\n'.format(
+        len(rows), sum(1 for row in rows if row['mismatch'])))
+    sys.stdout.write(spans.report() + '\n')
+
+
+if __name__ == '__main__':
+    main()
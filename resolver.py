@@ -0,0 +1,100 @@
+# stdlib
+from collections import deque as collections_deque
+
+
+'''
+Move conflict resolution for the ants protocol.
+
+Each ant proposes to the locations named by its prioritized vectors until it
+claims one that is passable and unclaimed. An ant which stays put always wins
+its own location; an ant bumped from a claim goes back in the queue and
+proposes its next vector. Every proposal consumes a vector, so the work done
+is linear in the total length of the vector lists actually consumed.
+
+Ant property identifier suffixes follow protocol.py:
+    O=oldloc
+    N=newloc
+    I=identity
+    V=vectorlist
+    D=vector(direction)
+
+'''
+
+
+###############################################################################
+
+
+def resolve(moves, step, passable):
+    '''Assign ants to distinct locations.
+
+    moves       -- dict oldloc --> (identity, iterable of vectors)
+    step        -- function (oldloc, vector) --> wrapped newloc
+    passable    -- function newloc --> bool (may an ant move there?)
+
+    Exhausted vector lists fall back to '='.
+
+    Return a dict newloc --> (oldloc, identity, vector, vectors).
+
+    '''
+    plans = {}
+    single = collections_deque(
+        (aO, aI, iter(aV)) for aO, (aI, aV) in moves.iteritems())
+    while single:
+        aO, aI, aV = single.popleft()
+        for aD in aV:
+            if aD == '=':
+                break
+            aN = step(aO, aD)
+            if passable(aN) and aN not in plans:
+                plans[aN] = (aO, aI, aD, aV)
+                break
+        else:
+            aD = '='
+        if aD == '=':
+            # staying wins; bump whoever claimed this location
+            if aO in plans:
+                bO, bI, bD, bV = plans[aO]
+                single.append((bO, bI, bV))
+            plans[aO] = (aO, aI, aD, aV)
+    return plans
+
+
+###############################################################################
+
+
+def bench(counts=(100, 500, 2000), size=(200, 200), repeat=5):
+    '''Time resolve() for ants packed around a single hill.'''
+    # only "python resolver.py" pays for these
+    import sys
+    import random
+    import timeit
+    import antmath
+    rows, cols = size
+    rng = random.Random(0)
+    water = set((rng.randrange(rows), rng.randrange(cols))
+                for _ in xrange(rows * cols // 10))
+    def step(loc, vector):
+        return antmath.wrap_loc(antmath.displace_loc(vector, loc), size)
+    def passable(loc):
+        return loc not in water
+    for count in counts:
+        side = int(count ** 0.5) + 1
+        r0, c0 = rows // 2 - side // 2, cols // 2 - side // 2
+        ants = [(r0 + i // side, c0 + i % side) for i in xrange(count)]
+        water.difference_update(ants)
+        vectors = {}
+        for loc in ants:
+            v = list('NESW=')
+            rng.shuffle(v)
+            vectors[loc] = v
+        def run():
+            moves = {loc: (i, vectors[loc]) for i, loc in enumerate(ants)}
+            return resolve(moves, step, passable)
+        assert len(run()) == count
+        best = min(timeit.repeat(run, number=1, repeat=repeat))
+        sys.stdout.write('{:5d} ants {:9.3f}ms {:7.2f}us/ant\n'.format(
+            count, best * 1000.0, best * 1e6 / count))
+
+
+if __name__ == '__main__':
+    bench()
@@ -0,0 +1,139 @@
+# stdlib
+import itertools
+# local
+import antmath as am
+
+
+'''
+Line of sight for the ants bots.
+
+A ray from an origin to a target within the view radius walks the cells that
+antmath.naive_dir leads through, and is clear when none of them is water. The
+walk only depends on the offset from origin to target, so the cells of every
+offset inside the radius are worked out once per game as a Stencil.
+
+Answers are cached by origin, negative ones included. The cache holds two
+generations of origins: when the current generation is full it becomes the
+previous one and the oldest generation is dropped, which bounds memory like
+an LRU without reordering on every lookup. Water never disappears, so a
+cached answer only changes when new water is discovered on its Stencil; an
+inverse table from each cell of a Stencil back to the offsets whose Stencils
+cross it finds exactly those answers.
+
+An Offset is a tuple:
+-- integer - rows from origin to target
+-- integer - columns from origin to target
+
+A Stencil is a tuple of Offsets: the cells a ray walks, origin and target
+included.
+
+'''
+
+
+###############################################################################
+
+
+def stencil(offset):
+    '''Return the Stencil of a ray from (0, 0) to offset.'''
+    o = (0, 0)
+    path = [o]
+    while o != offset:
+        v, _ = am.naive_dir(o, offset)
+        o = am.displace_loc(v, o)
+        path.append(o)
+    return tuple(path)
+
+
+class Sight(object):
+    '''Cached line of sight over a water bitmap.'''
+
+    def __init__(self, size, rad2, capacity=512):
+        self.rows, self.cols = size
+        self.rad2 = rad2
+        self.capacity = capacity            # origins per cache generation
+        self.water = bytearray(self.rows * self.cols) # cell --> 1 if water
+        self.current = {}                   # cell --> dict Offset --> bool
+        self.previous = {}                  # the generation before current
+        rad = int(rad2 ** 0.5)
+        self.stencils = {}                  # Offset --> Stencil
+        self.deltas = {}                    # Offset --> cell index deltas
+        inverse = {}                        # Offset --> list<Offset>
+        for dr, dc in itertools.product(xrange(-rad, rad + 1), repeat=2):
+            if dr * dr + dc * dc <= rad2:
+                path = stencil((dr, dc))
+                self.stencils[dr, dc] = path
+                self.deltas[dr, dc] = tuple(r * self.cols + c for r, c in path)
+                for p in path:
+                    inverse.setdefault(p, []).append((dr, dc))
+        self.inverse = inverse.items()
+        # origins at least rad away from every edge need no wrapping
+        self.inner = (xrange(rad, self.rows - rad), xrange(rad, self.cols - rad))
+
+    def offset(self, origin, target):
+        '''Return the Offset from a wrapped origin to the nearest image of
+        target.'''
+        h, w = self.rows, self.cols
+        dr = (target[0] - origin[0]) % h
+        dc = (target[1] - origin[1]) % w
+        return (dr - h if dr > h // 2 else dr,
+                dc - w if dc > w // 2 else dc)
+
+    def ray(self, origin, target):
+        '''Is there a direct path from the wrapped origin to the target?'''
+        offset = self.offset(origin, target)
+        if offset == (0, 0):
+            return True
+        stencil = self.stencils.get(offset)
+        if stencil is None:
+            return False # too far to check
+        r, c = origin
+        cell = r * self.cols + c
+        try:
+            answers = self.current[cell]
+        except KeyError:
+            answers = self.previous.pop(cell, None)
+            if answers is None:
+                answers = {}
+            if len(self.current) >= self.capacity:
+                self.previous = self.current
+                self.current = {}
+            self.current[cell] = answers
+        try:
+            return answers[offset]
+        except KeyError:
+            pass
+        water = self.water
+        if r in self.inner[0] and c in self.inner[1]:
+            clear = not any(water[cell + d] for d in self.deltas[offset])
+        else:
+            h, w = self.rows, self.cols
+            clear = not any(water[(r + dr) % h * w + (c + dc) % w]
+                            for dr, dc in stencil)
+        answers[offset] = clear
+        return clear
+
+    def discover(self, locs):
+        '''Add newly seen water and invalidate the rays it blocks.'''
+        h, w = self.rows, self.cols
+        water, current, previous = self.water, self.current, self.previous
+        for wr, wc in locs:
+            cell = wr * w + wc
+            if water[cell]:
+                continue
+            water[cell] = 1
+            if not current and not previous:
+                continue
+            for (pr, pc), offsets in self.inverse:
+                origin = (wr - pr) % h * w + (wc - pc) % w
+                for answers in (current.get(origin), previous.get(origin)):
+                    if answers:
+                        for offset in offsets:
+                            if answers.get(offset):
+                                answers[offset] = False
+
+    def __len__(self):
+        '''Number of cached answers.'''
+        return sum(len(answers) for generation in (self.current, self.previous)
+                   for answers in generation.itervalues())
+
+###############################################################################
@@ -0,0 +1,126 @@
+'''
+Spatial indexing for environment layers.
+
+A BucketIndex sorts the locations of one layer into a uniform grid of square
+buckets covering the (wrapped) map. A radius query only looks at the buckets
+which overlap the query's disc instead of every location in the layer.
+
+Queries measure plain squared distance between wrapped locations, like the
+rest of environment.py.
+
+A Goal is a tuple:
+-- integer - squared distance goal is from onlooker
+-- Loc - location of goal
+
+Perspectives hold the Goals of many onlookers at once, found from whichever
+side is smaller. Each onlooker's Goals are still found and kept as a list in
+Python; a scan of the bucket grid by an offset stencil, covering every
+onlooker in one pass, has been left for later.
+
+'''
+
+
+###############################################################################
+
+
+class BucketIndex(object):
+    '''Uniform bucket grid over a collection of wrapped locations.'''
+
+    def __init__(self, size, locs, span):
+        self.rows, self.cols = size
+        self.span = max(1, int(span))           # bucket side length
+        self.nrows = -(-self.rows // self.span) # bucket rows (ceiling)
+        self.ncols = -(-self.cols // self.span) # bucket columns (ceiling)
+        self.buckets = {}                       # (brow, bcol) --> list<Loc>
+        s = self.span
+        for loc in locs:
+            key = loc[0] // s, loc[1] // s
+            try:
+                self.buckets[key].append(loc)
+            except KeyError:
+                self.buckets[key] = [loc]
+
+    def near(self, loc, rad2):
+        '''Return the sorted list<Goal> of locations within rad2 of loc.
+
+        loc must be wrapped.
+
+        '''
+        r, c = loc
+        rad = int(rad2 ** 0.5) + 1
+        s = self.span
+        rows = xrange((r - rad) // s, (r + rad) // s + 1)
+        cols = xrange((c - rad) // s, (c + rad) // s + 1)
+        goals = []
+        for br in rows:
+            if not 0 <= br < self.nrows:
+                continue
+            for bc in cols:
+                bucket = self.buckets.get((br, bc))
+                if bucket:
+                    for g in bucket:
+                        d2 = (g[0] - r) ** 2 + (g[1] - c) ** 2
+                        if d2 <= rad2:
+                            goals.append((d2, g))
+        goals.sort()
+        return goals
+
+    def perspectives(self, origins, rad2, exclude=False):
+        '''Return Perspectives for every wrapped Loc in origins at once.
+
+        Pairs within rad2 are found from whichever side is smaller: each
+        origin queries this index, or each indexed location queries an index
+        of the origins. With exclude, an origin does not see itself.
+
+        '''
+        origins = list(origins)
+        locs = [loc for bucket in self.buckets.itervalues() for loc in bucket]
+        if len(locs) < len(origins):
+            row = {loc: i for i, loc in enumerate(origins)}
+            goals = [[] for _ in origins]
+            index = BucketIndex((self.rows, self.cols), origins, self.span)
+            for loc in locs:
+                for d2, o in index.near(loc, rad2):
+                    goals[row[o]].append((d2, loc))
+            for found in goals:
+                found.sort()
+        else:
+            goals = [self.near(loc, rad2) for loc in origins]
+        if exclude:
+            for loc, found in zip(origins, goals):
+                if found and found[0][1] == loc:
+                    found.pop(0)
+        return Perspectives(origins, goals)
+
+
+class Perspectives(object):
+    '''Goals of many onlookers.
+
+    origins     -- list<Loc> of the onlookers
+    row         -- dict Loc --> index into origins
+    found       -- list<list<Goal>> of each onlooker, aligned with origins
+
+    '''
+
+    def __init__(self, origins, goals):
+        self.origins = origins
+        self.row = {loc: i for i, loc in enumerate(origins)}
+        self.found = goals
+
+    def __len__(self):
+        return len(self.origins)
+
+    def goals(self, loc):
+        '''Return (a copy of) the list<Goal> of an onlooker, like digest().'''
+        return self.found[self.row[loc]][:]
+
+    def nearest(self, loc):
+        '''Return the nearest Goal of an onlooker or None.'''
+        found = self.found[self.row[loc]]
+        return found[0] if found else None
+
+    def count(self, loc):
+        '''Return how many Goals an onlooker has.'''
+        return len(self.found[self.row[loc]])
+
+###############################################################################
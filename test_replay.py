@@ -0,0 +1,67 @@
+# stdlib
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+# local
+import replay
+
+
+'''
+Round trip of a game recorded by "MyBot.py --record" through replay.py.
+
+'''
+
+
+SETUP = ['turn 0', 'loadtime 3000', 'turntime 1000', 'rows 20', 'cols 20',
+         'turns 10', 'viewradius2 55', 'attackradius2 5', 'spawnradius2 1',
+         'player_seed 7', 'ready']
+
+
+def game(turns):
+    '''Return the input of a short game as the engine would send it.'''
+    lines = SETUP[:]
+    for t in xrange(1, turns + 1):
+        lines.append('turn {}'.format(t))
+        lines.extend(['w 3 3', 'w 3 4', 'f 8 8', 'h 5 5 0', 'h 15 15 1',
+                      'a 5 5 0', 'a 6 6 0', 'a 14 14 1', 'go'])
+    lines.append('end')
+    return '\n'.join(lines) + '\n'
+
+
+###############################################################################
+
+
+class RoundTrip(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def record(self, *options):
+        fn = os.path.join(self.dir, 'game.gz')
+        here = os.path.dirname(os.path.abspath(__file__))
+        bot = subprocess.Popen(
+            [sys.executable, os.path.join(here, 'MyBot.py'), '--decider',
+             'Brownian', '--record', fn] + list(options),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        bot.communicate(game(8))
+        return fn
+
+    def test_batch(self):
+        rows = list(replay.replay(self.record('--batch')))
+        self.assertEqual([row['turn'] for row in rows], range(1, 9))
+        self.assertEqual(sum(row['mismatch'] for row in rows), 0)
+
+    def test_batch_blocks(self):
+        _, _, turns = replay.transcript(self.record('--batch'))
+        for block, _ in turns:
+            self.assertFalse(block[0].isspace())
+
+
+if __name__ == '__main__':
+    unittest.main()